@@ -18,11 +18,13 @@ import sys
 import re
 import copy
 import random
+import functools
+import threading
 import configparser as config
 import PIL.Image
 
 from .config import GlobalConfig, LocalConfig
-from .imagelogger import ImageLogger
+from .imagelogger import ImageLogger, Hotmap
 from .fileresolver import FileResolver
 from .errors import *
 
@@ -414,7 +416,7 @@ class Finder(LocalConfig):
 
         return acopy
 
-    def find(self, needle, haystack):
+    def find(self, needle, haystack, limit=None):
         """
         Find all needle targets in a haystack image.
 
@@ -422,9 +424,15 @@ class Finder(LocalConfig):
         :type needle: :py:class:`target.Target` or [:py:class:`target.Target`]
         :param haystack: image to look in
         :type haystack: :py:class:`target.Image`
+        :param limit: maximal number of matches to look for or None for all
+        :type limit: int or None
         :returns: all found matches (one in most use cases)
         :rtype: [:py:class:`match.Match`]
         :raises: :py:class:`NotImplementedError` if the base class method is called
+
+        Implementations may stop searching as soon as `limit` acceptable
+        matches are found, i.e. the returned matches are then not necessarily
+        the best ones but only ones satisfying the required similarity.
         """
         raise NotImplementedError("Abstract method call - call implementation of this class")
 
@@ -483,7 +491,7 @@ class AutoPyFinder(Finder):
         """
         self.__configure_backend(backend, category, reset)
 
-    def find(self, needle, haystack):
+    def find(self, needle, haystack, limit=None):
         """
         Custom implementation of the base method.
 
@@ -501,7 +509,7 @@ class AutoPyFinder(Finder):
         self.imglog.haystack = haystack
         self.imglog.dump_matched_images()
         # prepare a canvas solely for image logging
-        self.imglog.hotmaps.append(haystack.pil_image.copy())
+        self.imglog.hotmaps.append(Hotmap(haystack.pil_image))
 
         # class-specific dependencies
         from autopy import bitmap, screen
@@ -540,10 +548,7 @@ class AutoPyFinder(Finder):
             dx, dy = needle.center_offset.x, needle.center_offset.y
             from .match import Match
             matches = [Match(x, y, w, h, dx, dy, similarity)]
-            from PIL import ImageDraw
-            draw = ImageDraw.Draw(self.imglog.hotmaps[-1])
-            draw.rectangle((x, y, x+w, y+h), outline=(0,0,255))
-            del draw
+            self.imglog.hotmaps[-1].rectangle((x, y), (x+w, y+h), (0,0,255))
         else:
             matches = []
         self.imglog.log(30)
@@ -603,6 +608,9 @@ class ContourFinder(Finder):
             self.params[category]["minArea"] = CVParameter(0, 0, None, 100.0)
             # 1 L1 method, 2 L2 method, 3 L3 method
             self.params[category]["contoursMatch"] = CVParameter(1, 1, 3, enumerated=True)
+            # maximal displacement of matched contours from the needle layout
+            # as a fraction of the needle diagonal
+            self.params[category]["layoutTolerance"] = CVParameter(0.1, 0.0, 1.0, 0.05)
         elif category == "threshold":
             # 1 normal, 2 median, 3 gaussian, 4 none
             self.params[category]["blurType"] = CVParameter(4, 1, 4, enumerated=True)
@@ -649,7 +657,7 @@ class ContourFinder(Finder):
         """
         self.__configure(threshold_filter, reset)
 
-    def find(self, needle, haystack):
+    def find(self, needle, haystack, limit=None):
         """
         Custom implementation of the base method.
 
@@ -674,73 +682,220 @@ class ContourFinder(Finder):
         import cv2
         import numpy
 
-        orig_needle = numpy.array(needle.pil_image)
-        thresh_needle = self._binarize_image(orig_needle, log=False)
+        thresh_needle = self._binarize_target(needle)
         countours_needle = thresh_needle.copy()
         needle_contours = self._extract_contours(countours_needle, log=False)
 
-        orig_haystack = numpy.array(haystack.pil_image)
-        thresh_haystack = self._binarize_image(orig_haystack, log=True)
+        thresh_haystack = self._binarize_target(haystack)
+        self.imglog.hotmaps.append(thresh_haystack)
         countours_haystack = thresh_haystack.copy()
         haystack_contours = self._extract_contours(countours_haystack, log=True)
 
-        self.imglog.hotmaps.append(numpy.array(haystack.pil_image))
+        self.imglog.hotmaps.append(Hotmap(haystack.pil_image))
 
-        distances = numpy.ones((len(haystack_contours), len(needle_contours)))
-        for i, hcontour in enumerate(haystack_contours):
-            if cv2.contourArea(hcontour) < self.params["contour"]["minArea"].value:
-                continue
-            for j, ncontour in enumerate(needle_contours):
-                if cv2.contourArea(ncontour) < self.params["contour"]["minArea"].value:
-                    continue
-                distances[i,j] = cv2.matchShapes(hcontour, ncontour, self.params["contour"]["contoursMatch"].value, 0)
-                assert distances[i,j] >= 0.0
+        distances = self._match_contours(haystack_contours, needle_contours)
 
         from .match import Match
         matches = []
         nx, ny, nw, nh = cv2.boundingRect(numpy.concatenate(needle_contours, axis=0))
-        while True:
-            matching_haystack_contours = []
-            matching_haystack_distances = numpy.zeros(len(needle_contours))
-            for j in range(len(needle_contours)):
-                matching_haystack_distances[j] = numpy.min(distances[:,j])
-                index = numpy.where(distances[:,j] == matching_haystack_distances[j])
-                # we don't allow collapsing into the same needle contour, i.e.
-                # the map from the needle to the haystack contours is injective
-                # -> so here we cross the entire row rather than one value in it
-                distances[index[0][0],:] = 1.1  # like this works even for similarity 0.0
-                matching_haystack_contours.append(haystack_contours[index[0][0]])
-            average_distance = numpy.average(matching_haystack_distances)
-            required_distance = 1.0 - self.params["find"]["similarity"].value
+        required_distance = 1.0 - self.params["find"]["similarity"].value
+        # the assignments are produced in anchor order so take only the best ones
+        groups = sorted(self._assign_contours(distances, haystack_contours,
+                                              needle_contours, required_distance),
+                        key=lambda g: g[1])
+        if limit is not None:
+            groups = groups[:limit]
+        for group, average_distance in groups:
             logging.debug("Average distance to next needle shape is %s of max allowed %s",
                           average_distance, required_distance)
-            if average_distance > required_distance:
-                break
-            else:
-                shape = numpy.concatenate(matching_haystack_contours, axis=0)
-                x, y, w, h = cv2.boundingRect(shape)
-                # calculate needle upleft and downright points to return its (0,0) location
-                needle_upleft = (max(int((x-nx)*float(w)/nw), 0), max(int((y-ny)*float(h)/nh), 0))
-                needle_downright = (min(int(needle_upleft[0]+needle.width*float(w)/nw), haystack.width),
-                                    min(int(needle_upleft[1]+needle.height*float(h)/nh), haystack.height))
-                needle_center_offset = (needle.center_offset.x*float(w)/nw,
-                                        needle.center_offset.y*float(h)/nh)
-                cv2.rectangle(self.imglog.hotmaps[-1], needle_upleft, needle_downright, (0,0,0), 2)
-                cv2.rectangle(self.imglog.hotmaps[-1], needle_upleft, needle_downright, (255,255,255), 1)
-                # NOTE: to extract the region of interest just do:
-                # roi = thresh_haystack[y:y+h,x:x+w]
-                similarity = 1.0 - average_distance
-                self.imglog.similarities.append(similarity)
-                self.imglog.locations.append(needle_upleft)
-                matches.append(Match(needle_upleft[0], needle_upleft[1],
-                                     needle_downright[0] - needle_upleft[0],
-                                     needle_downright[1] - needle_upleft[1],
-                                     needle_center_offset[0], needle_center_offset[1],
-                                     similarity))
+            matching_haystack_contours = [haystack_contours[i] for i in group]
+            shape = numpy.concatenate(matching_haystack_contours, axis=0)
+            x, y, w, h = cv2.boundingRect(shape)
+            # calculate needle upleft and downright points to return its (0,0) location
+            needle_upleft = (max(int((x-nx)*float(w)/nw), 0), max(int((y-ny)*float(h)/nh), 0))
+            needle_downright = (min(int(needle_upleft[0]+needle.width*float(w)/nw), haystack.width),
+                                min(int(needle_upleft[1]+needle.height*float(h)/nh), haystack.height))
+            needle_center_offset = (needle.center_offset.x*float(w)/nw,
+                                    needle.center_offset.y*float(h)/nh)
+            self.imglog.hotmaps[-1].rectangle(needle_upleft, needle_downright, (0,0,0), 2)
+            self.imglog.hotmaps[-1].rectangle(needle_upleft, needle_downright, (255,255,255), 1)
+            # NOTE: to extract the region of interest just do:
+            # roi = thresh_haystack[y:y+h,x:x+w]
+            similarity = 1.0 - average_distance
+            self.imglog.similarities.append(similarity)
+            self.imglog.locations.append(needle_upleft)
+            matches.append(Match(needle_upleft[0], needle_upleft[1],
+                                 needle_downright[0] - needle_upleft[0],
+                                 needle_downright[1] - needle_upleft[1],
+                                 needle_center_offset[0], needle_center_offset[1],
+                                 similarity))
 
         self.imglog.log(30)
         return matches
 
+    def _match_contours(self, haystack_contours, needle_contours):
+        """
+        Compute the shape distances between all haystack and needle contours.
+
+        :param haystack_contours: contours extracted from the haystack
+        :type haystack_contours: [:py:class:`numpy.ndarray`]
+        :param needle_contours: contours extracted from the needle
+        :type needle_contours: [:py:class:`numpy.ndarray`]
+        :returns: haystack x needle distance matrix with a distance of one
+                  for contours smaller than the minimal area
+        :rtype: :py:class:`numpy.ndarray`
+
+        The Hu moments and areas of each contour are computed only once and
+        the metrics of OpenCV's shape matching are applied to all pairs at
+        once, reproducing the results of :py:func:`cv2.matchShapes`.
+        """
+        import cv2
+        import numpy
+
+        def hu_moments(contours):
+            areas = numpy.array([cv2.contourArea(c) for c in contours], dtype=numpy.float64)
+            valid = numpy.flatnonzero(areas >= self.params["contour"]["minArea"].value)
+            moments = numpy.zeros((len(valid), 7))
+            for k, i in enumerate(valid):
+                moments[k] = cv2.HuMoments(cv2.moments(contours[i])).flatten()
+            return valid, moments
+
+        distances = numpy.ones((len(haystack_contours), len(needle_contours)))
+        hvalid, hmoments = hu_moments(haystack_contours)
+        nvalid, nmoments = hu_moments(needle_contours)
+        if len(hvalid) == 0 or len(nvalid) == 0:
+            return distances
+
+        # only moments above this magnitude contribute to the distance
+        eps = 1.0e-5
+        hlog = numpy.sign(hmoments) * numpy.log10(numpy.maximum(numpy.abs(hmoments), eps))
+        nlog = numpy.sign(nmoments) * numpy.log10(numpy.maximum(numpy.abs(nmoments), eps))
+        usable = ((numpy.abs(hmoments) > eps)[:, numpy.newaxis, :] &
+                  (numpy.abs(nmoments) > eps)[numpy.newaxis, :, :])
+        method = self.params["contour"]["contoursMatch"].value
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            if method == 1:
+                terms = numpy.abs(1.0 / nlog[numpy.newaxis, :, :] - 1.0 / hlog[:, numpy.newaxis, :])
+                pair_distances = numpy.where(usable, terms, 0.0).sum(axis=2)
+            elif method == 2:
+                terms = numpy.abs(nlog[numpy.newaxis, :, :] - hlog[:, numpy.newaxis, :])
+                pair_distances = numpy.where(usable, terms, 0.0).sum(axis=2)
+            elif method == 3:
+                terms = numpy.abs((hlog[:, numpy.newaxis, :] - nlog[numpy.newaxis, :, :]) /
+                                  hlog[:, numpy.newaxis, :])
+                pair_distances = numpy.where(usable, terms, 0.0).max(axis=2)
+            else:
+                raise UnsupportedBackendError("Contour matching method %s is not supported" % method)
+        # shapes with only vanishing moments are infinitely far from the rest
+        hany = numpy.any(hmoments != 0.0, axis=1)
+        nany = numpy.any(nmoments != 0.0, axis=1)
+        pair_distances[hany[:, numpy.newaxis] != nany[numpy.newaxis, :]] = sys.float_info.max
+
+        distances[numpy.ix_(hvalid, nvalid)] = pair_distances
+        assert (distances >= 0.0).all()
+        return distances
+
+    def _assign_contours(self, distances, haystack_contours, needle_contours, required_distance):
+        """
+        Assign haystack contours to all needle contours for each plausible match.
+
+        :param distances: haystack x needle contour distance matrix
+        :type distances: :py:class:`numpy.ndarray`
+        :param haystack_contours: contours extracted from the haystack
+        :type haystack_contours: [:py:class:`numpy.ndarray`]
+        :param needle_contours: contours extracted from the needle
+        :type needle_contours: [:py:class:`numpy.ndarray`]
+        :param float required_distance: maximal average distance of a match
+        :returns: generator of haystack contour indices (one per needle contour
+                  of sufficient area) and their average distance for each match
+        :rtype: generator of ([int], float)
+
+        The largest needle contour serves as an anchor and its haystack candidates
+        are tried in order of increasing distance. For each anchor candidate the
+        remaining needle contours are only assigned to haystack contours near
+        their expected position according to the needle layout (scaled by the
+        size of the anchor candidate) which are looked up in a spatial grid.
+        Haystack contours assigned to an accepted match are not reused.
+        """
+        import cv2
+        import numpy
+
+        if len(haystack_contours) == 0 or len(needle_contours) == 0:
+            return
+        hrects = numpy.array([cv2.boundingRect(c) for c in haystack_contours], dtype=numpy.float64)
+        nrects = numpy.array([cv2.boundingRect(c) for c in needle_contours], dtype=numpy.float64)
+        hcenters = hrects[:, :2] + hrects[:, 2:] / 2.0
+        ncenters = nrects[:, :2] + nrects[:, 2:] / 2.0
+        nareas = numpy.array([cv2.contourArea(c) for c in needle_contours])
+        # contours below the minimal area are at distance one from anything
+        valid = nareas >= self.params["contour"]["minArea"].value
+        if not valid.any():
+            return
+        anchor = int(numpy.argmax(numpy.where(valid, nareas, -1.0)))
+        others = [j for j in range(len(needle_contours)) if j != anchor and valid[j]]
+        invalid_distance = float(len(needle_contours) - 1 - len(others))
+
+        _, _, nw, nh = cv2.boundingRect(numpy.concatenate(needle_contours, axis=0))
+        radius = self.params["contour"]["layoutTolerance"].value * numpy.hypot(nw, nh)
+        cell = max(radius, 1.0)
+        grid = {}
+        for i, (cx, cy) in enumerate(hcenters):
+            grid.setdefault((int(cx // cell), int(cy // cell)), []).append(i)
+
+        used = numpy.zeros(len(haystack_contours), dtype=bool)
+        for i in numpy.argsort(distances[:, anchor], kind="stable"):
+            # any further anchor candidates are even more distant
+            if distances[i, anchor] / len(needle_contours) > required_distance:
+                break
+            if used[i]:
+                continue
+            scale = numpy.sqrt(hrects[i, 2] * hrects[i, 3] /
+                               max(nrects[anchor, 2] * nrects[anchor, 3], 1.0))
+            scaled_radius = max(radius * scale, 1.0)
+            group, taken = {anchor: i}, {i}
+            total_distance = distances[i, anchor] + invalid_distance
+            for j in others:
+                expected = hcenters[i] + scale * (ncenters[j] - ncenters[anchor])
+                best, best_distance = None, None
+                for gx in range(int((expected[0] - scaled_radius) // cell),
+                                int((expected[0] + scaled_radius) // cell) + 1):
+                    for gy in range(int((expected[1] - scaled_radius) // cell),
+                                    int((expected[1] + scaled_radius) // cell) + 1):
+                        for k in grid.get((gx, gy), []):
+                            if used[k] or k in taken:
+                                continue
+                            if numpy.hypot(*(hcenters[k] - expected)) > scaled_radius:
+                                continue
+                            if best is None or distances[k, j] < best_distance:
+                                best, best_distance = k, distances[k, j]
+                if best is None:
+                    break
+                group[j] = best
+                taken.add(best)
+                total_distance += best_distance
+                if total_distance / len(needle_contours) > required_distance:
+                    break
+            average_distance = total_distance / len(needle_contours)
+            if average_distance > required_distance or len(group) < len(others) + 1:
+                continue
+            used[list(taken)] = True
+            yield [group[j] for j in sorted(group)], average_distance
+
+    def _binarize_target(self, target):
+        """
+        Binarize the image data of a target reusing any previous binarization.
+
+        :param target: image to binarize with the current threshold parameters
+        :type target: :py:class:`target.Image`
+        :returns: shared (read-only) binary version of the image
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        params = self.params["threshold"]
+        key = ("binarized", params["backend"]) + tuple(sorted((name, param.value)
+                                                              for name, param in params.items()
+                                                              if name != "backend"))
+        return target.derive(key, self._binarize_image, target.numpy_image)
+
     def _binarize_image(self, image, log=False):
         import cv2
         # blur first in order to avoid unwonted edges caused from noise
@@ -789,8 +944,9 @@ class ContourFinder(Finder):
             contours, hierarchy = rargs
         image_contours = [cv2.approxPolyDP(cnt, 3, True) for cnt in contours]
         if log:
-            cv2.drawContours(countours_image, image_contours, -1, (255,255,255))
-            self.imglog.hotmaps.append(countours_image)
+            hotmap = Hotmap(countours_image)
+            hotmap.contours(image_contours, (255,255,255))
+            self.imglog.hotmaps.append(hotmap)
         return image_contours
 
     def log(self, lvl):
@@ -825,6 +981,15 @@ class ContourFinder(Finder):
 class TemplateFinder(Finder):
     """Template matching backend provided by OpenCV."""
 
+    _spectra = {}
+    # relative cost of a transform element to a multiply-add of the direct
+    # matching which is much cheaper than the naive estimate since OpenCV
+    # tiles the correlation of large needles itself - calibrated on 1080p
+    # RGB haystacks where direct matching is faster for needles below about
+    # 96x96 even with cached spectra and spectra are only worth computing
+    # for needles from about 128x128 on (reused by further needles)
+    _spectral_cost_factor = 250
+
     def __init__(self, configure=True, synchronize=True):
         """Build a CV backend using OpenCV's template matching."""
         super(TemplateFinder, self).__init__(configure=False, synchronize=False)
@@ -858,6 +1023,8 @@ class TemplateFinder(Finder):
         self.params[category] = {}
         self.params[category]["backend"] = backend
         self.params[category]["nocolor"] = CVParameter(False)
+        # 0 choose by cost, 1 spatial domain (direct), 2 frequency domain (FFT)
+        self.params[category]["engine"] = CVParameter(0, 0, 2, enumerated=True)
         log.log(9, "%s %s\n", category, self.params[category])
 
     def configure_backend(self, backend=None, category="template", reset=False):
@@ -868,7 +1035,7 @@ class TemplateFinder(Finder):
         """
         self.__configure_backend(backend, category, reset)
 
-    def find(self, needle, haystack):
+    def find(self, needle, haystack, limit=None):
         """
         Custom implementation of the base method.
 
@@ -902,11 +1069,9 @@ class TemplateFinder(Finder):
             result = 1.0 - result
 
         import cv2
-        import numpy
-        universal_hotmap = result * 255.0
-        final_hotmap = numpy.array(self.imglog.haystack.pil_image)
-        if self.params["template"]["nocolor"].value:
-            final_hotmap = cv2.cvtColor(final_hotmap, cv2.COLOR_RGB2GRAY)
+        # the result is modified below so snapshot it only if it will be dumped
+        universal_hotmap = result * 255.0 if self.imglog.active else None
+        final_hotmap = Hotmap(haystack.pil_image, gray=no_color)
 
         # extract maxima once for each needle size region
         similarity = self.params["find"]["similarity"].value
@@ -924,8 +1089,8 @@ class TemplateFinder(Finder):
                 if len(matches) == 0:
                     self.imglog.similarities.append(maxVal)
                     self.imglog.locations.append(maxLoc)
-                    current_hotmap = numpy.copy(universal_hotmap)
-                    cv2.circle(current_hotmap, (maxLoc[0],maxLoc[1]), int(30*maxVal), (255,255,255))
+                    current_hotmap = Hotmap(universal_hotmap)
+                    current_hotmap.circle((maxLoc[0],maxLoc[1]), int(30*maxVal), (255,255,255))
                     self.imglog.hotmaps.append(current_hotmap)
                     self.imglog.hotmaps.append(final_hotmap)
 
@@ -934,19 +1099,22 @@ class TemplateFinder(Finder):
             else:
                 self.imglog.similarities.append(maxVal)
                 self.imglog.locations.append(maxLoc)
-                current_hotmap = numpy.copy(universal_hotmap)
-                cv2.circle(current_hotmap, (maxLoc[0],maxLoc[1]), int(30*maxVal), (255,255,255))
+                current_hotmap = Hotmap(universal_hotmap)
+                current_hotmap.circle((maxLoc[0],maxLoc[1]), int(30*maxVal), (255,255,255))
                 x, y = maxLoc
                 w, h = needle.width, needle.height
                 dx, dy = needle.center_offset.x, needle.center_offset.y
-                cv2.rectangle(final_hotmap, (x, y), (x+w, y+h), (0,0,0), 2)
-                cv2.rectangle(final_hotmap, (x, y), (x+w, y+h), (255,255,255), 1)
+                final_hotmap.rectangle((x, y), (x+w, y+h), (0,0,0), 2)
+                final_hotmap.rectangle((x, y), (x+w, y+h), (255,255,255), 1)
                 self.imglog.hotmaps.append(current_hotmap)
                 log.debug("Next best match is acceptable")
                 matches.append(Match(x, y, w, h, dx, dy, maxVal))
                 if similarity == 0.0:
                     # return just one match if no similarity requirement
                     break
+                if limit is not None and len(matches) >= limit:
+                    log.debug("Stopping at the required %s matches", limit)
+                    break
 
             res_w = haystack.width - needle.width + 1
             res_h = haystack.height - needle.height + 1
@@ -992,15 +1160,147 @@ class TemplateFinder(Finder):
         if method not in methods.keys():
             raise UnsupportedBackendError("Supported algorithms are in conflict")
 
-        numpy_needle = numpy.array(needle.pil_image)
-        numpy_haystack = numpy.array(haystack.pil_image)
         if nocolor:
-            gray_needle = cv2.cvtColor(numpy_needle, cv2.COLOR_RGB2GRAY)
-            gray_haystack = cv2.cvtColor(numpy_haystack, cv2.COLOR_RGB2GRAY)
-            match = cv2.matchTemplate(gray_haystack, gray_needle, methods[method])
+            numpy_needle, numpy_haystack = needle.gray_image, haystack.gray_image
         else:
-            match = cv2.matchTemplate(numpy_haystack, numpy_needle, methods[method])
+            numpy_needle, numpy_haystack = needle.numpy_image, haystack.numpy_image
+
+        engine = self.params["template"]["engine"].value
+        if method == "ccoeff_normed" and engine != 1:
+            source = TemplateFinder._spectra.get("source")
+            cached = source is not None and source() is haystack.pil_image
+            cached = cached and nocolor in TemplateFinder._spectra
+            if engine == 2 or self._prefer_spectral_match(numpy_needle.shape,
+                                                          numpy_haystack.shape,
+                                                          cached):
+                log.debug("Matching the template in the frequency domain")
+                spectra = self._haystack_spectra(haystack, numpy_haystack, nocolor)
+                return self._match_spectral(numpy_needle, numpy_haystack, spectra)
+
+        match = cv2.matchTemplate(numpy_haystack, numpy_needle, methods[method])
+        return match
+
+    def _prefer_spectral_match(self, needle_shape, haystack_shape, cached):
+        """
+        EXTRA DOCSTRING: Template matching backend - cost model.
+
+        Estimate whether a frequency domain correlation would be cheaper
+        than OpenCV's direct template matching for the given sizes.
+
+        The direct cost grows with the product of the result and needle
+        areas while the spectral one is a fixed number of full sized
+        transforms, fewer if the haystack spectra are already cached.
+        """
+        import cv2
+        import math
+        needle_h, needle_w = needle_shape[:2]
+        haystack_h, haystack_w = haystack_shape[:2]
+        channels = 1 if len(haystack_shape) == 2 else haystack_shape[2]
+        result_area = (haystack_h - needle_h + 1) * (haystack_w - needle_w + 1)
+        direct_cost = channels * result_area * needle_h * needle_w
+
+        dft_area = cv2.getOptimalDFTSize(haystack_h) * cv2.getOptimalDFTSize(haystack_w)
+        # one needle transform per channel and one inverse transform
+        transforms = channels + 1 if cached else 2 * channels + 1
+        spectral_cost = self._spectral_cost_factor * transforms * dft_area * math.log2(dft_area)
+
+        log.log(9, "Estimated direct matching cost %s and spectral cost %s",
+                direct_cost, spectral_cost)
+        return spectral_cost < direct_cost
+
+    def _haystack_spectra(self, haystack, numpy_haystack, nocolor):
+        """
+        EXTRA DOCSTRING: Template matching backend - haystack spectra.
 
+        Return the per-channel spectra and integral images of the haystack
+        reusing the ones of the last haystack if it is the same image.
+
+        The spectra are dropped as soon as their haystack is either replaced
+        by another one or garbage collected.
+        """
+        import weakref
+        spectra = TemplateFinder._spectra
+        source = spectra.get("source")
+        if source is None or source() is not haystack.pil_image:
+            spectra.clear()
+
+            def release(source):
+                if spectra.get("source") is source:
+                    spectra.clear()
+            spectra["source"] = weakref.ref(haystack.pil_image, release)
+        if nocolor in spectra:
+            log.log(9, "Reusing cached haystack spectra")
+            return spectra[nocolor]
+
+        import cv2
+        import numpy
+        height, width = numpy_haystack.shape[:2]
+        dft_height, dft_width = cv2.getOptimalDFTSize(height), cv2.getOptimalDFTSize(width)
+        channels = numpy_haystack.reshape(height, width, -1).astype(numpy.float32)
+        channel_spectra = []
+        for i in range(channels.shape[2]):
+            padded = cv2.copyMakeBorder(channels[..., i], 0, dft_height - height,
+                                        0, dft_width - width, cv2.BORDER_CONSTANT, value=0)
+            channel_spectra.append(cv2.dft(padded, nonzeroRows=height))
+        sums, squares = cv2.integral2(numpy_haystack, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+        sums = sums.reshape(height + 1, width + 1, -1)
+        # only the total of the squared values over all channels is needed
+        squares = squares.reshape(height + 1, width + 1, -1).sum(axis=2)
+
+        spectra[nocolor] = (channel_spectra, [sums[..., i] for i in range(sums.shape[2])], squares)
+        return spectra[nocolor]
+
+    def _match_spectral(self, numpy_needle, numpy_haystack, spectra):
+        """
+        EXTRA DOCSTRING: Template matching backend - frequency domain.
+
+        Compute the same normalized correlation coefficients as OpenCV's
+        "ccoeff_normed" via products of the haystack and needle spectra.
+        """
+        import cv2
+        import numpy
+        channel_spectra, sums, squares = spectra
+        dft_height, dft_width = channel_spectra[0].shape[:2]
+        haystack_h, haystack_w = numpy_haystack.shape[:2]
+        needle_h, needle_w = numpy_needle.shape[:2]
+        result_h, result_w = haystack_h - needle_h + 1, haystack_w - needle_w + 1
+
+        needle = numpy_needle.reshape(needle_h, needle_w, -1).astype(numpy.float64)
+        needle -= needle.mean(axis=(0, 1))
+        needle_norm = numpy.sqrt((needle ** 2).sum())
+        if needle_norm < sys.float_info.epsilon:
+            # OpenCV's convention for needles without any variance
+            return numpy.ones((result_h, result_w), numpy.float32)
+
+        product = None
+        for i, spectrum in enumerate(channel_spectra):
+            padded = cv2.copyMakeBorder(needle[..., i].astype(numpy.float32),
+                                        0, dft_height - needle_h, 0, dft_width - needle_w,
+                                        cv2.BORDER_CONSTANT, value=0)
+            channel_product = cv2.mulSpectrums(spectrum, cv2.dft(padded, nonzeroRows=needle_h),
+                                               0, conjB=True)
+            product = channel_product if product is None else product + channel_product
+        # the mean of the needle is zero so the haystack mean does not contribute here
+        correlation = cv2.idft(product, flags=cv2.DFT_SCALE | cv2.DFT_REAL_OUTPUT,
+                               nonzeroRows=result_h)[:result_h, :result_w]
+
+        def window_sums(integral):
+            return (integral[needle_h:, needle_w:] - integral[:-needle_h, needle_w:] -
+                    integral[needle_h:, :-needle_w] + integral[:-needle_h, :-needle_w])
+        deviation = window_sums(squares)
+        for channel_sums in sums:
+            window = window_sums(channel_sums)
+            deviation -= window * window / (needle_h * needle_w)
+        deviation = numpy.sqrt(numpy.maximum(deviation, 0, out=deviation), out=deviation)
+        deviation *= needle_norm
+
+        match = numpy.zeros((result_h, result_w), numpy.float32)
+        numpy.divide(correlation, deviation, out=match, where=deviation > 0, casting="unsafe")
+        # same treatment of rounding errors at the boundaries as OpenCV
+        overflow = numpy.abs(match) >= 1.0
+        if overflow.any():
+            match[overflow] = numpy.where(numpy.abs(correlation[overflow]) < 1.125 * deviation[overflow],
+                                          numpy.sign(correlation[overflow]), 0.0)
         return match
 
     def log(self, lvl):
@@ -1040,6 +1340,10 @@ class FeatureFinder(Finder):
         by default in newer OpenCV versions (>3.0).
     """
 
+    _hfeatures = {}
+    _hfeatures_lock = threading.Lock()
+    _nfeatures = {}
+
     def __init__(self, configure=True, synchronize=True):
         """Build a CV backend using OpenCV's feature matching."""
         super(FeatureFinder, self).__init__(configure=False, synchronize=False)
@@ -1063,6 +1367,8 @@ class FeatureFinder(Finder):
         self.detector = None
         self.extractor = None
         self.matcher = None
+        self._library = []
+        self._library_index = None
 
         # additional preparation
         if configure:
@@ -1099,6 +1405,8 @@ class FeatureFinder(Finder):
             self.params[category]["minMatchedFeatures"] = CVParameter(4, 1, None)
             # 0 for matched/detected ratio, 1 for projected/matched ratio
             self.params[category]["similarityRatio"] = CVParameter(1, 0, 1, enumerated=True)
+            # look for all needle instances instead of the best one only
+            self.params[category]["multiInstance"] = CVParameter(False)
         elif category == "fdetect":
             self.params[category]["nzoom"] = CVParameter(1.0, 1.0, 10.0, 2.5)
             self.params[category]["hzoom"] = CVParameter(1.0, 1.0, 10.0, 2.5)
@@ -1294,7 +1602,7 @@ class FeatureFinder(Finder):
         """
         self.__synchronize(feature_detect, feature_extract, feature_match, reset)
 
-    def find(self, needle, haystack):
+    def find(self, needle, haystack, limit=None):
         """
         Custom implementation of the base method.
 
@@ -1303,8 +1611,9 @@ class FeatureFinder(Finder):
 
         See base method for details.
 
-        .. warning:: Finding multiple matches is currently not supported
-                     and this will currently only return a single match.
+        .. warning:: Finding multiple matches is only supported if the
+                     "multiInstance" feature parameter is set and will
+                     otherwise only return a single match.
 
         Available methods are: a combination of feature detector,
         extractor, and matcher.
@@ -1317,12 +1626,12 @@ class FeatureFinder(Finder):
 
         import cv2
         import numpy
-        ngray = cv2.cvtColor(numpy.array(needle.pil_image), cv2.COLOR_RGB2GRAY)
-        hgray = cv2.cvtColor(numpy.array(haystack.pil_image), cv2.COLOR_RGB2GRAY)
-        self.imglog.hotmaps.append(numpy.array(haystack.pil_image))
-        self.imglog.hotmaps.append(numpy.array(haystack.pil_image))
-        self.imglog.hotmaps.append(numpy.array(haystack.pil_image))
-        self.imglog.hotmaps.append(numpy.array(haystack.pil_image))
+        ngray = needle.gray_image
+        hgray = haystack.gray_image
+        self.imglog.hotmaps.append(Hotmap(haystack.pil_image))
+        self.imglog.hotmaps.append(Hotmap(haystack.pil_image))
+        self.imglog.hotmaps.append(Hotmap(haystack.pil_image))
+        self.imglog.hotmaps.append(Hotmap(haystack.pil_image))
 
         # project more points for debugging purposes and image logging
         npoints = []
@@ -1331,7 +1640,24 @@ class FeatureFinder(Finder):
         npoints.append((needle.width / 2, needle.height / 2))
 
         similarity = self.params["find"]["similarity"].value
-        hpoints = self._project_features(npoints, ngray, hgray, similarity)
+        if self.params["feature"]["multiInstance"].value:
+            from .match import Match
+            matches = []
+            instances = self._project_instances(npoints, ngray, hgray, similarity, limit,
+                                                hframe=(haystack.pil_image, None),
+                                                nfile=needle.filename,
+                                                ndigest=self._needle_digest(needle))
+            for hpoints, instance_similarity in instances:
+                x, y = hpoints[0]
+                w, h = tuple(numpy.abs(numpy.subtract(hpoints[3], hpoints[0])))
+                matches.append(Match(x, y, w, h, 0, 0, instance_similarity))
+            self.imglog.log(30 if len(matches) > 0 else 40)
+            return matches
+
+        hpoints = self._project_features(npoints, ngray, hgray, similarity,
+                                         hframe=(haystack.pil_image, None),
+                                         nfile=needle.filename,
+                                         ndigest=self._needle_digest(needle))
         if hpoints is not None and len(hpoints) > 0:
             from .match import Match
             x, y = hpoints[0]
@@ -1343,12 +1669,158 @@ class FeatureFinder(Finder):
         self.imglog.log(40)
         return []
 
-    def _project_features(self, locations_in_needle, ngray, hgray, similarity):
+    def add_to_library(self, needle):
+        """
+        Register a needle to be looked for when finding the library needles.
+
+        :param needle: target image to register
+        :type needle: :py:class:`Image`
+        :raises: :py:class:`UnsupportedBackendError` if the feature matcher
+                 cannot be trained with the library needles
+        """
+        self._check_library_matcher()
+        self._library.append(needle)
+        # the trained matcher has to be rebuilt with the new needle
+        self._library_index = None
+
+    def find_library(self, haystack):
+        """
+        Find all needles registered in the library in a single matching pass.
+
+        :param haystack: image to look in
+        :type haystack: :py:class:`target.Image`
+        :returns: all found matches for each registered needle
+        :rtype: {:py:class:`Image`: [:py:class:`match.Match`]}
+        :raises: :py:class:`UnsupportedBackendError` if the feature matcher
+                 cannot be trained with the library needles
+
+        The descriptors of all registered needles are added to one trained
+        matcher so that the haystack descriptors vote for all needles at once
+        and only needles with enough votes are matched and projected in the
+        haystack as in :py:func:`find` reusing the already detected features.
+        """
+        import cv2
+        import numpy
+        self._check_library_matcher()
+        self.synchronize_backend(category="fdetect")
+        self.synchronize_backend(category="fextract")
+        library_key = self._features_key() + (self.params["fmatch"]["backend"],)
+        if self._library_index is None or self._library_index[0] != library_key:
+            self._library_index = self._train_library(library_key)
+        _, matcher, library_features = self._library_index
+
+        hgray = haystack.gray_image
+        hkeypoints, hdescriptors = self._detect_haystack_features(hgray, (haystack.pil_image, None))
+        results = {needle: [] for needle in self._library}
+        if matcher is None or hdescriptors is None:
+            log.debug("No library needle or haystack features to match")
+            return results
+        min_features = self.params["feature"]["minDetectedFeatures"].value
+        if len(hkeypoints) < min_features:
+            log.debug("No acceptable library match after feature detection: "
+                      "only %s/%s haystack features detected", len(hkeypoints), min_features)
+            return results
+
+        # haystack descriptors are the query here and the library the train set
+        if self.params["fmatch"]["ratioTest"].value:
+            matches = self._ratio_test(matcher.knnMatch(hdescriptors, 2))
+        else:
+            matches = [m[0] for m in matcher.knnMatch(hdescriptors, 1) if len(m) > 0]
+        votes = {}
+        for match in matches:
+            votes.setdefault(match.imgIdx, []).append(match)
+        log.debug("Library features voted for %s of %s needles", len(votes), len(library_features))
+
+        from .match import Match
+        similarity = self.params["find"]["similarity"].value
+        min_matches = self.params["feature"]["minMatchedFeatures"].value
+        for i in sorted(votes.keys()):
+            needle, ngray = library_features[i]
+            if len(votes[i]) < min_matches:
+                log.log(9, "Skipping needle %s with only %s votes", needle, len(votes[i]))
+                continue
+
+            # verify the voted needle as usual reusing all detected features
+            self.imglog.clear()
+            self.imglog.needle = needle
+            self.imglog.haystack = haystack
+            self.imglog.dump_matched_images()
+            for _ in range(4):
+                self.imglog.hotmaps.append(Hotmap(haystack.pil_image))
+            npoints = [(0, 0), (needle.width, 0), (0, needle.height),
+                       (needle.width, needle.height)]
+            hpoints = self._project_features(npoints, ngray, hgray, similarity,
+                                             hframe=(haystack.pil_image, None),
+                                             nfile=needle.filename,
+                                             ndigest=self._needle_digest(needle))
+            if hpoints is not None and len(hpoints) > 0:
+                x, y = hpoints[0]
+                w, h = tuple(numpy.abs(numpy.subtract(hpoints[3], hpoints[0])))
+                results[needle] = [Match(x, y, w, h, 0, 0, self.imglog.similarities[-1])]
+            log.debug("Library needle %s with %s votes matched with similarity %s",
+                      needle, len(votes[i]), self.imglog.similarities[-1])
+            self.imglog.log(30 if len(results[needle]) > 0 else 40)
+        self.imglog.clear()
+
+        return results
+
+    def _check_library_matcher(self):
+        """
+        EXTRA DOCSTRING: Feature matching backend - library matcher check.
+
+        Make sure the configured feature matcher is an OpenCV descriptor
+        matcher that can be trained with the descriptors of all needles
+        since the in-house matchers only match one needle at a time.
+        """
+        backend = self.params["fmatch"]["backend"]
+        if backend not in self.algorithms["feature_matchers"] or backend.startswith("in-house"):
+            raise UnsupportedBackendError("Feature matcher %s cannot be trained for library matching, "
+                                          "use one of %s" % (backend, [b for b in self.algorithms["feature_matchers"]
+                                                                       if not b.startswith("in-house")]))
+
+    def _train_library(self, library_key):
+        """
+        EXTRA DOCSTRING: Feature matching backend - library training.
+
+        Detect the features of all library needles and add their descriptors
+        to a single trained matcher.
+        """
+        import cv2
+        import numpy
+        library_descriptors = []
+        library_features = []
+        for needle in self._library:
+            ngray = needle.gray_image
+            nkeypoints, ndescriptors = self._detect_needle_features(ngray, needle.filename,
+                                                                    self._needle_digest(needle))
+            if ndescriptors is None or len(nkeypoints) < self.params["feature"]["minDetectedFeatures"].value:
+                log.debug("Excluding needle %s with too few features from the library", needle)
+                continue
+            library_descriptors.append(ndescriptors)
+            library_features.append((needle, ngray))
+
+        if len(library_descriptors) == 0:
+            return (library_key, None, library_features)
+        # use a separate matcher since the regular one is recreated at each matching
+        matcher = cv2.DescriptorMatcher_create(self.params["fmatch"]["backend"])
+        matcher.add(library_descriptors)
+        matcher.train()
+        log.debug("Trained library matcher with %s needles", len(library_descriptors))
+        return (library_key, matcher, library_features)
+
+    def _project_features(self, locations_in_needle, ngray, hgray, similarity,
+                          hframe=None, nfile=None, ndigest=None):
         """
         EXTRA DOCSTRING: Feature matching backend - wrapper.
 
         Wrapper for the internal feature detection, matching and location
         projection used by all public feature matching functions.
+
+        The optional haystack frame is a pair of the source image and the
+        region within it that was converted to the gray haystack, used to
+        reuse haystack features for multiple needles on the same frame.
+        The optional needle file is used to persist the needle features
+        with the optional digest of the gray needle computed in advance.
         """
         # default logging in case no match is found (further overridden by match stages)
         self.imglog.locations.append((0, 0))
@@ -1360,7 +1832,8 @@ class FeatureFinder(Finder):
                             self.params["fmatch"]["backend"]]))
         nkp, ndc, hkp, hdc = self._detect_features(ngray, hgray,
                                                    self.params["fdetect"]["backend"],
-                                                   self.params["fextract"]["backend"])
+                                                   self.params["fextract"]["backend"],
+                                                   hframe, nfile, ndigest)
 
         min_features = self.params["feature"]["minDetectedFeatures"].value
         if len(nkp) < min_features or len(hkp) < min_features:
@@ -1391,88 +1864,351 @@ class FeatureFinder(Finder):
             self._log_features(30, self.imglog.locations, self.imglog.hotmaps[-1], 3, 0, 0, 255)
             return locations_in_haystack
 
-    def _detect_features(self, ngray, hgray, detect, extract):
+    def _project_instances(self, locations_in_needle, ngray, hgray, similarity,
+                           limit=None, hframe=None, nfile=None, ndigest=None):
+        """
+        EXTRA DOCSTRING: Feature matching backend - multiple instances wrapper.
+
+        Project the needle locations for all needle instances in the haystack
+        from a single feature detection and matching pass, returning a list
+        of projected locations and similarity for each instance.
+
+        All haystack features are matched to the needle ones so that each
+        instance collects its own matches. Random sample consensus on these
+        is repeated, each time removing the matches within the projected
+        needle, to find the area of each instance. Every such area is then
+        verified by matching and projecting the needle features as for a
+        single match but only against the haystack features in the area.
+        """
+        # default logging in case no match is found (further overridden by match stages)
+        self.imglog.locations.append((0, 0))
+        self.imglog.similarities.append(0.0)
+
+        nkp, ndc, hkp, hdc = self._detect_features(ngray, hgray,
+                                                   self.params["fdetect"]["backend"],
+                                                   self.params["fextract"]["backend"],
+                                                   hframe, nfile, ndigest)
+        min_features = self.params["feature"]["minDetectedFeatures"].value
+        if len(nkp) < min_features or len(hkp) < min_features:
+            log.debug("No acceptable match after feature detection: only %s/%s needle "
+                      "and %s/%s haystack features detected",
+                      len(nkp), min_features, len(hkp), min_features)
+            return []
+
+        if self.params["fmatch"]["backend"] not in self.algorithms["feature_matchers"]:
+            raise UnsupportedBackendError("Feature detector %s is not among the supported"
+                                          "ones %s" % (self.params["fmatch"]["backend"],
+                                                       self.algorithms[self.categories["fmatch"]]))
+        self.synchronize_backend(category="fmatch")
+        # the symmetry test is not applicable since needle features have multiple matches
+        if self.params["fmatch"]["ratioTest"].value:
+            matches = self._ratio_test(self.matcher.knnMatch(hdc, ndc, 2))
+        else:
+            matches = [m[0] for m in self.matcher.knnMatch(hdc, ndc, 1) if len(m) > 0]
+
+        import cv2
+        import numpy
+        npoints = numpy.array([nkp[m.trainIdx].pt for m in matches], dtype=numpy.float32).reshape(-1, 2)
+        hpoints = numpy.array([hkp[m.queryIdx].pt for m in matches], dtype=numpy.float32).reshape(-1, 2)
+        hkp_points = numpy.array([kp.pt for kp in hkp], dtype=numpy.float32).reshape(-1, 2)
+        needle_h, needle_w = ngray.shape[:2]
+        corners = numpy.array([[(0, 0), (needle_w, 0), (0, needle_h), (needle_w, needle_h)]],
+                              dtype=numpy.float32)
+
+        min_matches = self.params["feature"]["minMatchedFeatures"].value
+        instances = []
+        free = numpy.ones(len(hkp), dtype=bool)
+        remaining = numpy.ones(len(matches), dtype=bool)
+        while numpy.count_nonzero(remaining) >= min_matches:
+            if limit is not None and len(instances) >= limit:
+                log.debug("Stopping at the required %s matches", limit)
+                break
+            indices = numpy.flatnonzero(remaining)
+            H, mask = cv2.findHomography(npoints[indices], hpoints[indices], cv2.RANSAC,
+                                         self.params["feature"]["ransacReprojThreshold"].value)
+            if H is None or mask is None:
+                log.log(9, "No further homography among %s matches", len(indices))
+                break
+            inliers = indices[mask.ravel() == 1]
+            if len(inliers) < min_matches:
+                log.log(9, "Only %s/%s consensus matches remain", len(inliers), min_matches)
+                break
+
+            # all remaining matches within the projected needle belong to this instance
+            area = cv2.perspectiveTransform(corners, H)[0]
+            (left, up), (right, down) = area.min(axis=0), area.max(axis=0)
+            def in_area(points, left=left, up=up, right=right, down=down):
+                return ((points[:, 0] >= left) & (points[:, 0] <= right) &
+                        (points[:, 1] >= up) & (points[:, 1] <= down))
+            instance = remaining & in_area(hpoints)
+            instance[inliers] = True
+            remaining &= ~instance
+
+            # verify the instance as a single needle match within its area
+            area_indices = numpy.flatnonzero(in_area(hkp_points) & free)
+            log.log(9, "Verifying needle instance in x [%s, %s] and y [%s, %s] with %s features",
+                    left, right, up, down, len(area_indices))
+            if len(area_indices) < min_matches:
+                continue
+            self.imglog.locations.append((0, 0))
+            self.imglog.similarities.append(0.0)
+            mnkp, mhkp = self._match_features(nkp, ndc, [hkp[i] for i in area_indices],
+                                              hdc[area_indices], self.params["fmatch"]["backend"])
+            if self.imglog.similarities[-1] < similarity or len(mnkp) < min_matches:
+                log.debug("Needle instance with %s matched features has low similarity %s",
+                          len(mnkp), self.imglog.similarities[-1])
+                continue
+            projected = self._project_locations(locations_in_needle, mnkp, mhkp)
+            if len(projected) == 0 or self.imglog.similarities[-1] < similarity:
+                log.debug("Needle instance has low similarity %s after RANSAC projection",
+                          self.imglog.similarities[-1])
+                continue
+            (left, up), (right, down) = numpy.min(projected, axis=0), numpy.max(projected, axis=0)
+            if right - left < 1 or down - up < 1:
+                log.debug("Needle instance has a degenerate projection")
+                continue
+            log.debug("Needle instance found with similarity %s", self.imglog.similarities[-1])
+            instances.append((projected, self.imglog.similarities[-1]))
+            # haystack features of found instances are not available to further ones
+            free &= ~in_area(hkp_points, left, up, right, down)
+            if similarity == 0.0:
+                # return just one match if no similarity requirement
+                break
+
+        self._log_features(30, self.imglog.locations, self.imglog.hotmaps[-1], 3, 0, 0, 255)
+        log.debug("A total of %i needle instances found", len(instances))
+        return sorted(instances, key=lambda x: x[1], reverse=True)
+
+    def _detect_features(self, ngray, hgray, detect, extract, hframe=None, nfile=None, ndigest=None):
         """
         EXTRA DOCSTRING: Feature matching backend - detection/extraction stage (1).
 
         Detect all keypoints and calculate their respective decriptors.
         """
-        nfactor = self.params["fdetect"]["nzoom"].value
-        hfactor = self.params["fdetect"]["hzoom"].value
+        # include only methods tested for compatibility
+        if (detect not in self.algorithms["feature_detectors"]
+                or extract not in self.algorithms["feature_extractors"]):
+            raise UnsupportedBackendError("Feature detector %s is not among the supported"
+                                          "ones %s" % (detect, self.algorithms[self.categories["fdetect"]]))
+        self.synchronize_backend(category="fdetect")
+        self.synchronize_backend(category="fextract")
+
+        nkeypoints, ndescriptors = self._detect_needle_features(ngray, nfile, ndigest)
+        hkeypoints, hdescriptors = self._detect_haystack_features(hgray, hframe)
+
+        log.debug("Detected %s keypoints in needle and %s in haystack",
+                  len(nkeypoints), len(hkeypoints))
+        hkp_locations = [hkp.pt for hkp in hkeypoints]
+        self._log_features(10, hkp_locations, self.imglog.hotmaps[-4], 3, 255, 0, 0)
+
+        return (nkeypoints, ndescriptors, hkeypoints, hdescriptors)
+
+    def _features_key(self):
+        """
+        EXTRA DOCSTRING: Feature matching backend - features identity.
+
+        Return all parameters determining the detected features of an image.
+        """
+        features_key = ()
+        for category in ("fdetect", "fextract"):
+            for name, param in sorted(self.params[category].items()):
+                features_key += ((category, name, getattr(param, "value", param)),)
+        return features_key
+
+    def _needle_digest(self, needle):
+        """
+        EXTRA DOCSTRING: Feature matching backend - needle digest.
+
+        Digest of the gray needle data validating its stored features which
+        is computed only once for the same needle image (if stored at all).
+        """
+        if needle.filename is None:
+            return None
+        return needle.derive("gray_digest", self._gray_digest, needle.gray_image)
+
+    @staticmethod
+    def _gray_digest(ngray):
+        import hashlib
+        return hashlib.sha1(ngray.tobytes() + str(ngray.shape).encode()).hexdigest()
+
+    def _detect_needle_features(self, ngray, nfile=None, ndigest=None):
+        """
+        EXTRA DOCSTRING: Feature matching backend - needle detection/extraction.
+
+        Detect the needle keypoints and calculate their decriptors using the
+        already synchronized detector and extractor.
+
+        Needle features are reused for the same needle file and parameters and
+        also stored along its match file (if any) for subsequent runs.
+        """
+        nfeatures_key = None
+        if nfile is not None:
+            # needle features are only valid for the same image data and parameters
+            digest = ndigest if ndigest is not None else self._gray_digest(ngray)
+            nfeatures_key = (repr(self._features_key()), digest)
+        nfeatures = self._load_needle_features(nfile, nfeatures_key)
+        if nfeatures is not None:
+            return nfeatures
 
         # zoom in if explicitly set
         import cv2
+        nfactor = self.params["fdetect"]["nzoom"].value
         if nfactor > 1.0:
             log.debug("Zooming x%i needle", nfactor)
             ngray = cv2.resize(ngray, None, fx=nfactor, fy=nfactor)
-        if hfactor > 1.0:
-            log.debug("Zooming x%i haystack", hfactor)
-            hgray = cv2.resize(hgray, None, fx=hfactor, fy=hfactor)
 
-        # include only methods tested for compatibility
-        if (detect in self.algorithms["feature_detectors"]
-              and extract in self.algorithms["feature_extractors"]):
-            self.synchronize_backend(category="fdetect")
-            self.synchronize_backend(category="fextract")
+        # keypoints and feature vectors (descriptors)
+        nkeypoints = self.detector.detect(ngray)
+        (nkeypoints, ndescriptors) = self.extractor.compute(ngray, nkeypoints)
+        # reduce keypoint coordinates to the original image size
+        for nkeypoint in nkeypoints:
+            nkeypoint.pt = (int(nkeypoint.pt[0] / nfactor),
+                            int(nkeypoint.pt[1] / nfactor))
+        self._store_needle_features(nfile, nfeatures_key, nkeypoints, ndescriptors)
 
-            # keypoints
-            nkeypoints = self.detector.detect(ngray)
-            hkeypoints = self.detector.detect(hgray)
+        return nkeypoints, ndescriptors
 
-            # feature vectors (descriptors)
-            (nkeypoints, ndescriptors) = self.extractor.compute(ngray, nkeypoints)
-            (hkeypoints, hdescriptors) = self.extractor.compute(hgray, hkeypoints)
+    def _detect_haystack_features(self, hgray, hframe=None):
+        """
+        EXTRA DOCSTRING: Feature matching backend - haystack detection/extraction.
 
-        else:
-            raise UnsupportedBackendError("Feature detector %s is not among the supported"
-                                          "ones %s" % (detect, self.algorithms[self.categories["fdetect"]]))
+        Detect the haystack keypoints and calculate their decriptors using the
+        already synchronized detector and extractor.
+
+        Haystack features are reused from previous calls with the same
+        haystack frame, detection, and extraction parameters.
+        """
+        hfeatures_key = None
+        if hframe is not None:
+            source, region = hframe
+            hfeatures_key = (region,) + self._features_key()
+            # haystack regions of the same frame might be processed concurrently
+            with FeatureFinder._hfeatures_lock:
+                if FeatureFinder._hfeatures.get("source") is not source:
+                    FeatureFinder._hfeatures.clear()
+                    FeatureFinder._hfeatures["source"] = source
+                hfeatures = FeatureFinder._hfeatures.get(hfeatures_key)
+            if hfeatures is not None:
+                log.debug("Reusing haystack features detected in the same frame")
+                return hfeatures
 
+        # zoom in if explicitly set
+        import cv2
+        hfactor = self.params["fdetect"]["hzoom"].value
+        if hfactor > 1.0:
+            log.debug("Zooming x%i haystack", hfactor)
+            hgray = cv2.resize(hgray, None, fx=hfactor, fy=hfactor)
+
+        hkeypoints = self.detector.detect(hgray)
+        (hkeypoints, hdescriptors) = self.extractor.compute(hgray, hkeypoints)
         # reduce keypoint coordinates to the original image size
-        for nkeypoint in nkeypoints:
-            nkeypoint.pt = (int(nkeypoint.pt[0] / nfactor),
-                            int(nkeypoint.pt[1] / nfactor))
         for hkeypoint in hkeypoints:
             hkeypoint.pt = (int(hkeypoint.pt[0] / hfactor),
                             int(hkeypoint.pt[1] / hfactor))
+        if hfeatures_key is not None:
+            with FeatureFinder._hfeatures_lock:
+                # the features of a frame that was replaced meanwhile are not kept
+                if FeatureFinder._hfeatures.get("source") is source:
+                    FeatureFinder._hfeatures[hfeatures_key] = (hkeypoints, hdescriptors)
 
-        log.debug("Detected %s keypoints in needle and %s in haystack",
-                  len(nkeypoints), len(hkeypoints))
-        hkp_locations = [hkp.pt for hkp in hkeypoints]
-        self._log_features(10, hkp_locations, self.imglog.hotmaps[-4], 3, 255, 0, 0)
+        return hkeypoints, hdescriptors
 
-        return (nkeypoints, ndescriptors, hkeypoints, hdescriptors)
+    def _load_needle_features(self, nfile, nfeatures_key):
+        """
+        EXTRA DOCSTRING: Feature matching backend - needle features loading.
 
-    def _match_features(self, nkeypoints, ndescriptors,
-                        hkeypoints, hdescriptors, match):
+        Load previously detected needle keypoints and descriptors from memory
+        or from a features file along the needle match file, returning none
+        if they are missing or stale with respect to the needle or parameters.
         """
-        EXTRA DOCSTRING: Feature matching backend - matching stage (2).
+        if nfile is None:
+            return None
+        if nfile in FeatureFinder._nfeatures:
+            cached_key, nfeatures = FeatureFinder._nfeatures[nfile]
+            if cached_key == nfeatures_key:
+                log.log(9, "Reusing needle features of %s", nfile)
+                return nfeatures
+
+        features_filename = os.path.splitext(nfile)[0] + ".npz"
+        if not os.path.exists(features_filename):
+            return None
+        import cv2
+        import numpy
+        try:
+            with numpy.load(features_filename, allow_pickle=False) as data:
+                if (str(data["params"]), str(data["digest"])) != nfeatures_key:
+                    log.debug("Stale needle features file %s will be regenerated", features_filename)
+                    return None
+                keypoints, descriptors = data["keypoints"], data["descriptors"]
+        except (OSError, ValueError, KeyError) as error:
+            log.warning("Needle features file %s cannot be read: %s", features_filename, error)
+            return None
 
-        Match two sets of keypoints based on their descriptors.
+        nkeypoints = tuple(cv2.KeyPoint(x, y, size, angle, response, int(octave), int(class_id))
+                           for x, y, size, angle, response, octave, class_id in keypoints)
+        ndescriptors = descriptors if len(nkeypoints) > 0 else None
+        log.debug("Loaded %s needle features from %s", len(nkeypoints), features_filename)
+        FeatureFinder._nfeatures[nfile] = (nfeatures_key, (nkeypoints, ndescriptors))
+        return nkeypoints, ndescriptors
+
+    def _store_needle_features(self, nfile, nfeatures_key, nkeypoints, ndescriptors):
         """
-        def ratio_test(matches):
-            """
-            The ratio test checks the first and second best match. If their
-            ratio is close to 1.0, there are both good candidates for the
-            match and the probabilty of error when choosing one is greater.
-            Therefore these matches are ignored and thus only matches of
-            greater probabilty are returned.
-            """
-            matches2 = []
-            for m in matches:
+        EXTRA DOCSTRING: Feature matching backend - needle features storing.
 
-                if len(m) > 1:
-                    # smooth to make 0/0 case also defined as 1.0
-                    smooth_dist1 = m[0].distance + 0.0000001
-                    smooth_dist2 = m[1].distance + 0.0000001
+        Store the detected needle keypoints and descriptors in memory and in
+        a features file along the needle match file if there is such.
+        """
+        if nfile is None:
+            return
+        FeatureFinder._nfeatures[nfile] = (nfeatures_key, (nkeypoints, ndescriptors))
 
-                    if smooth_dist1 / smooth_dist2 < self.params["fmatch"]["ratioThreshold"].value:
-                        matches2.append(m[0])
-                else:
-                    matches2.append(m[0])
+        # only targets with their own match settings get a features file
+        if not os.path.exists(os.path.splitext(nfile)[0] + ".match"):
+            return
+        import numpy
+        features_filename = os.path.splitext(nfile)[0] + ".npz"
+        keypoints = numpy.array([(kp.pt[0], kp.pt[1], kp.size, kp.angle, kp.response,
+                                  kp.octave, kp.class_id) for kp in nkeypoints],
+                                dtype=numpy.float64).reshape(-1, 7)
+        descriptors = ndescriptors if ndescriptors is not None else numpy.zeros((0, 0))
+        try:
+            numpy.savez_compressed(features_filename, params=nfeatures_key[0], digest=nfeatures_key[1],
+                                   keypoints=keypoints, descriptors=descriptors)
+            log.debug("Stored %s needle features in %s", len(nkeypoints), features_filename)
+        except OSError as error:
+            log.warning("Needle features file %s cannot be written: %s", features_filename, error)
 
-            log.log(9, "Ratio test result is %i/%i", len(matches2), len(matches))
-            return matches2
+    def _ratio_test(self, matches):
+        """
+        EXTRA DOCSTRING: Feature matching backend - ratio test.
+
+        The ratio test checks the first and second best match. If their
+        ratio is close to 1.0, there are both good candidates for the
+        match and the probabilty of error when choosing one is greater.
+        Therefore these matches are ignored and thus only matches of
+        greater probabilty are returned.
+        """
+        import numpy
+        # skip keypoints without any match at all
+        candidates = [m for m in matches if len(m) > 0]
+        distances = numpy.array([(m[0].distance, m[1].distance if len(m) > 1 else 0.0)
+                                 for m in candidates], dtype=numpy.float64).reshape(-1, 2)
+        unique = numpy.array([len(m) == 1 for m in candidates], dtype=bool)
+        # smooth to make 0/0 case also defined as 1.0
+        ratios = (distances[:, 0] + 0.0000001) / (distances[:, 1] + 0.0000001)
+        passed = unique | (ratios < self.params["fmatch"]["ratioThreshold"].value)
+        matches2 = [candidates[i][0] for i in numpy.flatnonzero(passed)]
+
+        log.log(9, "Ratio test result is %i/%i", len(matches2), len(matches))
+        return matches2
 
+    def _match_features(self, nkeypoints, ndescriptors,
+                        hkeypoints, hdescriptors, match):
+        """
+        EXTRA DOCSTRING: Feature matching backend - matching stage (2).
+
+        Match two sets of keypoints based on their descriptors.
+        """
         def symmetry_test(nmatches, hmatches):
             """
             Refines the matches with a symmetry test which extracts
@@ -1481,17 +2217,19 @@ class FeatureFinder(Finder):
             matching of each other to ensure the error by accepting the
             match is not too large.
             """
-            import cv2
-            matches2 = []
-            for nm in nmatches:
-                for hm in hmatches:
-
-                    if nm.queryIdx == hm.trainIdx and nm.trainIdx == hm.queryIdx:
-                        m = cv2.DMatch(nm.queryIdx, nm.trainIdx, nm.distance)
-                        matches2.append(m)
-                        break
-
-            log.log(9, "Symmetry test result is %i/%i", len(matches2), len(matches))
+            import numpy
+            if len(nmatches) == 0 or len(hmatches) == 0:
+                return []
+            nindices = numpy.array([(nm.queryIdx, nm.trainIdx) for nm in nmatches], dtype=numpy.int64)
+            hindices = numpy.array([(hm.trainIdx, hm.queryIdx) for hm in hmatches], dtype=numpy.int64)
+            # encode each (needle, haystack) keypoint pair as a single integer
+            base = max(nindices[:, 1].max(), hindices[:, 1].max()) + 1
+            npairs = nindices[:, 0] * base + nindices[:, 1]
+            hpairs = hindices[:, 0] * base + hindices[:, 1]
+            mutual = numpy.isin(npairs, hpairs)
+            matches2 = [nmatches[i] for i in numpy.flatnonzero(mutual)]
+
+            log.log(9, "Symmetry test result is %i/%i", len(matches2), len(nmatches))
             return matches2
 
         # include only methods tested for compatibility
@@ -1513,14 +2251,14 @@ class FeatureFinder(Finder):
         else:
             if self.params["fmatch"]["ratioTest"].value:
                 matches = self.matcher.knnMatch(ndescriptors, hdescriptors, 2)
-                matches = ratio_test(matches)
+                matches = self._ratio_test(matches)
             else:
                 matches = self.matcher.knnMatch(ndescriptors, hdescriptors, 1)
                 matches = [m[0] for m in matches]
             if self.params["fmatch"]["symmetryTest"].value:
                 if self.params["fmatch"]["ratioTest"].value:
                     hmatches = self.matcher.knnMatch(hdescriptors, ndescriptors, 2)
-                    hmatches = ratio_test(hmatches)
+                    hmatches = self._ratio_test(hmatches)
                 else:
                     hmatches = self.matcher.knnMatch(hdescriptors, ndescriptors, 1)
                     hmatches = [hm[0] for hm in hmatches]
@@ -1656,10 +2394,9 @@ class FeatureFinder(Finder):
     def _log_features(self, lvl, locations, hotmap, radius=0, r=255, g=255, b=255):
         if lvl < self.imglog.logging_level:
             return
-        import cv2
         for loc in locations:
             x, y = loc
-            cv2.circle(hotmap, (int(x), int(y)), radius, (r, g, b))
+            hotmap.circle((int(x), int(y)), radius, (r, g, b))
 
 
 class CascadeFinder(Finder):
@@ -1712,7 +2449,7 @@ class CascadeFinder(Finder):
         """
         self.__configure_backend(backend, category, reset)
 
-    def find(self, needle, haystack):
+    def find(self, needle, haystack, limit=None):
         """
         Custom implementation of the base method.
 
@@ -1732,8 +2469,8 @@ class CascadeFinder(Finder):
         needle_cascade = cv2.CascadeClassifier(needle.data_file)
         if needle_cascade.empty():
             raise Exception("Could not load the cascade classifier properly")
-        gray_haystack = cv2.cvtColor(numpy.array(haystack.pil_image), cv2.COLOR_RGB2GRAY)
-        canvas = numpy.array(haystack.pil_image)
+        gray_haystack = haystack.gray_image
+        canvas = Hotmap(haystack.pil_image)
 
         from .match import Match
         matches = []
@@ -1745,9 +2482,9 @@ class CascadeFinder(Finder):
                                                  self.params["cascade"]["minHeight"].value),
                                                 (self.params["cascade"]["maxWidth"].value,
                                                  self.params["cascade"]["maxHeight"].value))
-        for (x,y,w,h) in rects:
-            cv2.rectangle(canvas, (x,y), (x+w,y+h), (0, 0, 0), 2)
-            cv2.rectangle(canvas, (x,y), (x+w,y+h), (255, 0, 0), 1)
+        for (x,y,w,h) in rects[:limit]:
+            canvas.rectangle((x,y), (x+w,y+h), (0, 0, 0), 2)
+            canvas.rectangle((x,y), (x+w,y+h), (255, 0, 0), 1)
             dx, dy = needle.center_offset.x, needle.center_offset.y
             matches.append(Match(x, y, w, h, dx, dy))
 
@@ -1772,6 +2509,16 @@ class TextFinder(ContourFinder):
     Neumann L., Matas J.: Real-Time Scene Text Localization and Recognition, CVPR 2012
     """
 
+    _pool = None
+    _pool_config = None
+    _worker_ocr = None
+    _ocr_cache = {}
+    _ocr_hits = 0
+    _ocr_misses = 0
+    _word_index_cache = (None, None, None)
+    _rendered_texts = {}
+    _east_lock = threading.Lock()
+
     def __init__(self, configure=True, synchronize=True):
         """Build a CV backend using OpenCV's text matching options."""
         super(TextFinder, self).__init__(configure=False, synchronize=False)
@@ -1790,10 +2537,11 @@ class TextFinder(ContourFinder):
 
         # other attributes
         self.erc1 = None
-        self.erf1 = None
         self.erc2 = None
-        self.erf2 = None
+        self.erfilters = []
         self.ocr = None
+        # number of text regions skipped as implausible for the needle in the last search
+        self.skipped_regions = 0
 
         # additional preparation
         if configure:
@@ -1841,13 +2589,40 @@ class TextFinder(ContourFinder):
 
         if category == "text":
             self.params[category]["datapath"] = CVParameter("../misc")
+            # OCR the entire haystack once at word level and look up all text needles in it
+            self.params[category]["word_index"] = CVParameter(False)
+            # skip OCR of text regions too narrow or wide for the needle given the height of
+            # their text lines and the minimal and maximal ratio of character width to text
+            # height (opt-in since unusual fonts or layouts could skip the needle's region)
+            self.params[category]["prune_regions"] = CVParameter(False)
+            self.params[category]["min_char_ratio"] = CVParameter(0.2, 0.0, None, 0.1)
+            self.params[category]["max_char_ratio"] = CVParameter(1.2, 0.0, None, 0.1)
+            # comma separated font files (or "default" for the PIL font) to render the needle
+            # text with and match it as an image before resorting to OCR (empty for none)
+            self.params[category]["render_fonts"] = CVParameter("")
+            # comma separated font sizes in pixels to render the needle text with
+            self.params[category]["render_sizes"] = CVParameter("11,12,13,14,15,16")
+            # number of needle renderings to reuse across searches (0 for none)
+            self.params[category]["render_cache_size"] = CVParameter(100, 0, None, 10.0)
+            # verify the matched renderings with OCR if true or accept them if false
+            self.params[category]["render_verify"] = CVParameter(False)
         elif category == "tdetect":
             if backend == "east":
                 # network input dimensions - must be divisible by 32, however currently only
                 # 320x320 doesn't error out from the OpenCV implementation
                 self.params[category]["input_res_x"] = CVParameter(320, 32, None, 32.0)
                 self.params[category]["input_res_y"] = CVParameter(320, 32, None, 32.0)
+                # choose the network input dimensions from the haystack size instead, splitting
+                # haystacks larger than the maximal input dimensions into tiles of a single batch
+                # (opt-in since it changes the detection of existing configurations)
+                self.params[category]["adaptive_res"] = CVParameter(False)
+                self.params[category]["max_input_res"] = CVParameter(640, 32, None, 32.0)
+                # number of threads for the network inference (0 for the OpenCV default) - as
+                # OpenCV threading is process-wide, other OpenCV calls use it during the inference
+                self.params[category]["threads"] = CVParameter(0, 0, None, 1.0)
                 self.params[category]["min_box_confidence"] = CVParameter(0.8, 0.0, 1.0, 0.1)
+                # maximal intersection over union of two text boxes to keep both
+                self.params[category]["nms_threshold"] = CVParameter(0.4, 0.0, 1.0, 0.1)
             elif backend == "erstat":
                 self.params[category]["thresholdDelta"] = CVParameter(1, 1, 255, 50.0)
                 self.params[category]["minArea"] = CVParameter(0.00025, 0.0, 1.0, 0.25, 0.001)
@@ -1856,6 +2631,9 @@ class TextFinder(ContourFinder):
                 self.params[category]["nonMaxSuppression"] = CVParameter(True)
                 self.params[category]["minProbabilityDiff"] = CVParameter(0.1, 0.0, 1.0, 0.25, 0.01)
                 self.params[category]["minProbability2"] = CVParameter(0.3, 0.0, 1.0, 0.25, 0.01)
+                # channels to extract regions from - R, G, B, lightness, gradient magnitude,
+                # and lowercase for the negatives of the first four (bright text on dark)
+                self.params[category]["channels"] = CVParameter("RGBLMrgbl")
             elif backend == "contours":
                 self.params[category]["maxArea"] = CVParameter(10000, 0, None, 1000.0, 10.0)
                 self.params[category]["minWidth"] = CVParameter(1, 0, None, 100.0)
@@ -1883,6 +2661,9 @@ class TextFinder(ContourFinder):
                 self.params[category]["oem"] = CVParameter(3, 0, 3, enumerated=True)
                 # 13 different page segmentation modes - see Tesseract API
                 self.params[category]["psmode"] = CVParameter(3, 0, 13, enumerated=True)
+                # number of OCR worker processes to recognize text regions in parallel with
+                if backend in ["pytesseract", "tesserocr"]:
+                    self.params[category]["workers"] = CVParameter(1, 1, None, 1.0)
                 if backend == "pytesseract":
                     self.params[category]["extra_configs"] = CVParameter("")
                     # TODO: there could be a decent way to change component modes
@@ -1906,8 +2687,16 @@ class TextFinder(ContourFinder):
                 # perform custom image thresholding if set to true or leave it to the OCR
                 self.params[category]["binarize_text"] = CVParameter(True)
             self.params[category]["min_confidence"] = CVParameter(0, 0, 100, 25.0)
+            # number of OCR outputs for already seen text regions to reuse (0 for none)
+            self.params[category]["cache_size"] = CVParameter(1000, 0, None, 100.0)
             # zoom factor for improved OCR processing due to higher resolution
             self.params[category]["zoom_factor"] = CVParameter(1.0, 1.0, 100.0, 25.0)
+            # zoom each text region to the optimal letter height of the OCR instead
+            # (opt-in since it replaces the fixed zoom factor of existing configurations)
+            self.params[category]["adaptive_zoom"] = CVParameter(False)
+            self.params[category]["text_height"] = CVParameter(40, 10, 100, 10.0)
+            # maximal number of pixels of an adaptively zoomed text region (0 for unlimited)
+            self.params[category]["max_pixels"] = CVParameter(4000000, 0, None, 1000000.0)
             # border size to wrap around text field to improve recognition rate
             self.params[category]["border_size"] = CVParameter(10, 0, 100, 25.0)
             # 0 erode, 1 dilate, 2 both, 3 none
@@ -1982,15 +2771,9 @@ class TextFinder(ContourFinder):
             self.east_net = cv2.dnn.readNet(os.path.join(datapath, 'frozen_east_text_detection.pb'))
         elif category == "tdetect" and backend == "erstat":
             self.erc1 = cv2.text.loadClassifierNM1(os.path.join(datapath, 'trained_classifierNM1.xml'))
-            self.erf1 = cv2.text.createERFilterNM1(self.erc1,
-                                                   self.params["tdetect"]["thresholdDelta"].value,
-                                                   self.params["tdetect"]["minArea"].value,
-                                                   self.params["tdetect"]["maxArea"].value,
-                                                   self.params["tdetect"]["minProbability"].value,
-                                                   self.params["tdetect"]["nonMaxSuppression"].value,
-                                                   self.params["tdetect"]["minProbabilityDiff"].value)
             self.erc2 = cv2.text.loadClassifierNM2(os.path.join(datapath, 'trained_classifierNM2.xml'))
-            self.erf2 = cv2.text.createERFilterNM2(self.erc2, self.params["tdetect"]["minProbability2"].value)
+            # filter pairs are built on demand per detection worker from the current parameters
+            self.erfilters = []
         elif category == "tdetect":
             # nothing to sync
             return
@@ -2089,7 +2872,7 @@ class TextFinder(ContourFinder):
                            threshold_filter, threshold_filter2, threshold_filter3,
                            reset)
 
-    def find(self, needle, haystack):
+    def find(self, needle, haystack, limit=None):
         """
         Custom implementation of the base method.
 
@@ -2097,6 +2880,11 @@ class TextFinder(ContourFinder):
         :type needle: :py:class:`Text`
 
         See base method for details.
+
+        If the word index is enabled, the haystack is recognized only once
+        for any number of needles which are then looked up among its words.
+        If fonts to render the needle with are configured, the renderings are
+        matched as images and OCR is only used if none of them is found.
         """
         needle.match_settings = self
         needle.use_own_settings = True
@@ -2104,11 +2892,22 @@ class TextFinder(ContourFinder):
         self.imglog.haystack = haystack
         self.imglog.dump_matched_images()
 
+        if self.params["text"]["word_index"].value:
+            return self._find_indexed(needle, haystack, limit)
+        if self.params["text"]["render_fonts"].value:
+            matches = self._find_rendered(needle, haystack, limit)
+            if len(matches) > 0:
+                return matches
+            log.debug("No rendered text matched, falling back to OCR")
+            self.imglog.hotmaps = []
+            self.imglog.similarities = []
+            self.imglog.locations = []
+
         import cv2
         import numpy
         text_needle = needle.value
-        img_haystack = numpy.array(haystack.pil_image)
-        final_hotmap = numpy.array(haystack.pil_image)
+        img_haystack = haystack.numpy_image
+        final_hotmap = Hotmap(haystack.pil_image)
 
         # detect characters and group them into detected text
         backend = self.params["tdetect"]["backend"]
@@ -2127,87 +2926,27 @@ class TextFinder(ContourFinder):
         # perform optical character recognition on the final regions
         backend = self.params["ocr"]["backend"]
         log.debug("Recognizing text with %s", backend)
+        # BUG: we hit segfault when using the BeamSearch OCR backend so disallow it
+        if backend == "beamSearch":
+            raise NotImplementedError("Current version of BeamSearch segfaults so it's not yet available")
+        self.skipped_regions = 0
+        if self.params["text"]["prune_regions"].value:
+            text_regions = self._prune_text_regions(text_regions, text_needle, img_haystack)
         from .match import Match
         matches = []
-        def binarize_step(threshold, text_img):
-            if self.params["ocr"]["binarize_text"].value:
-                first_threshold = self.params["threshold"]
-                self.params["threshold"] = self.params[threshold]
-                try:
-                    text_img = self._binarize_image(text_img)
-                finally:
-                    self.params["threshold"] = first_threshold
-                    return text_img
-            else:
-                return cv2.cvtColor(text_img, cv2.COLOR_RGB2GRAY)
-        for i, text_box in enumerate(text_regions):
-
-            # main OCR preprocessing stage
-            border = self.params["ocr"]["border_size"].value
-            text_img = img_haystack[max(text_box[1]-border,0):min(text_box[1]+text_box[3]+border,img_haystack.shape[0]),
-                                    max(text_box[0]-border,0):min(text_box[0]+text_box[2]+border,img_haystack.shape[1])]
-            factor = self.params["ocr"]["zoom_factor"].value
-            log.debug("Zooming x%i candidate for improved OCR processing", factor)
-            text_img = cv2.resize(text_img, None, fx=factor, fy=factor)
-            text_img = binarize_step("threshold2", text_img)
-            if self.params["ocr"]["distance_transform"].value:
-                text_img = cv2.distanceTransform(text_img,
-                                                 self.params["ocr"]["dt_distance_type"].value,
-                                                 self.params["ocr"]["dt_mask_size"].value)
-                text_img = cv2.cvtColor(numpy.asarray(text_img, dtype='uint8'), cv2.COLOR_GRAY2RGB)
-                text_img = binarize_step("threshold3", text_img)
-            if self.params["ocr"]["erode_dilate"].value < 3:
-                element = cv2.getStructuringElement(self.params["ocr"]["ed_kernel_type"].value,
-                                                    (self.params["ocr"]["ed_kernel_width"].value,
-                                                     self.params["ocr"]["ed_kernel_height"].value))
-                if self.params["ocr"]["erode_dilate"].value in [0, 2]:
-                    text_img = cv2.erode(text_img, element)
-                if self.params["ocr"]["erode_dilate"].value in [1, 2]:
-                    text_img = cv2.dilate(text_img, element)
+        text_imgs = (self._prepare_text_region(img_haystack, text_box) for text_box in text_regions)
+        recognitions = self._recognize_text_regions(text_imgs)
+        for i, (text_box, (text_img, output)) in enumerate(zip(text_regions, recognitions)):
             self.imglog.hotmaps.append(text_img)
-
-            # BUG: we hit segfault when using the BeamSearch OCR backend so disallow it
-            if backend == "beamSearch":
-                raise NotImplementedError("Current version of BeamSearch segfaults so it's not yet available")
-            # TODO: we can do this now with pytesseract/tesserocr but have to evaluate its usefulness
-            #vector<Rect> boxes;
-            #vector<string> words;
-            #vector<float> confidences;
-            #output = ocr.run(group_img, &boxes, &words, &confidences, cv2.text.OCR_LEVEL_WORD)
-            # redirection of tesseract's streams can only be done on the file descriptor level
-            # sys.stdout = open(os.devnull, 'w')
-            if backend == "pytesseract":
-                output = self.ocr.image_to_string(text_img,
-                                                  lang=self.params["ocr"]["language"].value,
-                                                  config=self.ocr_config)
-                logging.debug("Running pytesseract with extra command line %s", self.ocr_config)
-            elif backend == "tesserocr":
-                self.ocr.SetImage(PIL.Image.fromarray(text_img))
-                output = self.ocr.GetUTF8Text()
-            else:
-                stdout_fd = sys.stdout.fileno() if hasattr(sys.stdout, "fileno") else 1
-                stderr_fd = sys.stderr.fileno() if hasattr(sys.stderr, "fileno") else 2
-                null_fo = open(os.devnull, 'wb')
-                with os.fdopen(os.dup(stdout_fd), 'wb') as cpout_fo:
-                    with os.fdopen(os.dup(stderr_fd), 'wb') as cperr_fo:
-                        sys.stdout.flush()
-                        sys.stderr.flush()
-                        os.dup2(null_fo.fileno(), stdout_fd)
-                        os.dup2(null_fo.fileno(), stderr_fd)
-                        output = self.ocr.run(text_img, text_img,
-                                              self.params["ocr"]["min_confidence"].value,
-                                              self.params["ocr"]["component_level"].value)
-                        sys.stdout.flush()
-                        sys.stderr.flush()
-                        os.dup2(cpout_fo.fileno(), stdout_fd)
-                        os.dup2(cperr_fo.fileno(), stderr_fd)
-                null_fo.close()
             if self.params["ocr"]["component_level"].value == 1:
                 # strip of the new line character which is never useful
                 output = output.rstrip()
             log.debug("OCR output %s = '%s'", i+1, output)
 
-            similarity = 1.0 - float(needle.distance_to(output)) / max(len(output), len(text_needle))
+            # any distance beyond the required similarity is not computed exactly
+            length = max(len(output), len(text_needle))
+            max_distance = int((1.0 - self.params["find"]["similarity"].value) * length + 1e-9)
+            similarity = 1.0 - float(needle.distance_to(output, max_distance)) / length
             log.debug("Similarity = '%s'", similarity)
             self.imglog.similarities.append(similarity)
             if similarity >= self.params["find"]["similarity"].value:
@@ -2215,177 +2954,1043 @@ class TextFinder(ContourFinder):
                 self.imglog.locations.append((text_box[0], text_box[1]))
                 x, y, w, h = text_box
                 dx, dy = needle.center_offset.x, needle.center_offset.y
-                cv2.rectangle(final_hotmap, (x, y), (x+w, y+h), (0, 0, 0), 2)
-                cv2.rectangle(final_hotmap, (x, y), (x+w, y+h), (255, 255, 255), 1)
+                final_hotmap.rectangle((x, y), (x+w, y+h), (0, 0, 0), 2)
+                final_hotmap.rectangle((x, y), (x+w, y+h), (255, 255, 255), 1)
                 matches.append(Match(x, y, w, h, dx, dy, similarity))
+                if limit is not None and len(matches) >= limit:
+                    log.debug("Stopping OCR at the required %s matches", limit)
+                    break
+        # release any remaining OCR work
+        recognitions.close()
         matches = sorted(matches, key=lambda x:x.similarity, reverse=True)
 
         self.imglog.hotmaps.append(final_hotmap)
         self.imglog.log(30)
         return matches
 
+    def _prune_text_regions(self, text_regions, text_needle, img_haystack=None):
+        """
+        EXTRA DOCSTRING: Text matching backend - OCR candidate pruning.
+
+        Drop the text regions whose width cannot fit the needle with as
+        many characters as the required similarity allows given the height
+        of their text lines and order the rest by how close they are to the
+        expected needle width. Without a haystack the region height is used
+        as the height of a single text line.
+        """
+        import math
+        self.skipped_regions = 0
+        length = len(text_needle)
+        if length == 0:
+            return text_regions
+        tolerance = int((1.0 - self.params["find"]["similarity"].value) * length + 1e-9)
+        min_ratio = self.params["text"]["min_char_ratio"].value
+        max_ratio = self.params["text"]["max_char_ratio"].value
+        mean_ratio = math.sqrt(min_ratio * max_ratio)
+
+        candidates = []
+        for text_box in text_regions:
+            width, height = text_box[2], text_box[3]
+            lines = 1
+            if img_haystack is not None:
+                line_heights = self._text_line_heights(img_haystack, text_box)
+                if len(line_heights) > 0:
+                    height = max(line_heights)
+                    # smaller runs are rather detached marks or noise than separate lines
+                    lines = sum(1 for h in line_heights if 2 * h >= height)
+            # the needle might wrap over multiple lines which could also contain other text
+            min_width = (length - tolerance) * min_ratio * height / lines
+            max_width = (length + tolerance) * max_ratio * height if lines == 1 else float("inf")
+            if height > 0 and not min_width <= width <= max_width:
+                continue
+            expected_width = length * mean_ratio * height / lines
+            deviation = abs(math.log(max(width, 1) / max(expected_width, 1)))
+            candidates.append((deviation, text_box))
+        self.skipped_regions = len(text_regions) - len(candidates)
+        log.debug("Skipping OCR of %s out of %s text regions of implausible size for the needle",
+                  self.skipped_regions, len(text_regions))
+        # the sort is stable so that equally likely regions preserve their order
+        candidates.sort(key=lambda c: c[0])
+        return [text_box for _, text_box in candidates]
+
+    def _text_line_heights(self, img_haystack, text_box):
+        """
+        EXTRA DOCSTRING: Text matching backend - text line estimation.
+
+        :returns: heights of the text lines in a region as runs of rows with
+                  text pixels, empty if no text can be separated from the
+                  background
+        :rtype: [int]
+        """
+        import cv2
+        import numpy
+        region = img_haystack[text_box[1]:text_box[1]+text_box[3], text_box[0]:text_box[0]+text_box[2]]
+        if region.size == 0:
+            return []
+        if region.ndim == 3:
+            region = cv2.cvtColor(region, cv2.COLOR_RGB2GRAY)
+        _, text_mask = cv2.threshold(region, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # the text is the minority of the pixels whatever its polarity
+        text_mask = text_mask > 0
+        if text_mask.mean() > 0.5:
+            text_mask = ~text_mask
+        rows = numpy.concatenate(([0], text_mask.any(axis=1).astype(numpy.int8), [0]))
+        changes = numpy.flatnonzero(numpy.diff(rows))
+        return [int(h) for h in changes[1::2] - changes[::2]]
+
+    def _find_rendered(self, needle, haystack, limit=None):
+        """
+        EXTRA DOCSTRING: Text matching backend - rendered text matching.
+
+        Render the needle text with each configured font and size and locate
+        the renderings in the haystack with template matching, optionally
+        verifying the best nonoverlapping locations with OCR.
+        """
+        import cv2
+        import numpy
+        from .match import Match
+        gray_haystack = haystack.gray_image
+        required_similarity = self.params["find"]["similarity"].value
+        char_canvas = Hotmap(haystack.pil_image)
+        text_canvas = Hotmap(haystack.pil_image)
+        final_hotmap = Hotmap(haystack.pil_image)
+        self.imglog.hotmaps.append(char_canvas)
+        self.imglog.hotmaps.append(text_canvas)
+
+        fonts = [font.strip() for font in self.params["text"]["render_fonts"].value.split(",") if font.strip()]
+        sizes = [int(size) for size in self.params["text"]["render_sizes"].value.split(",") if size.strip()]
+        candidates = []
+        for font in fonts:
+            for size in sizes:
+                rendered = self._render_text(needle.value, font, size)
+                if (rendered is None or rendered.shape[0] > gray_haystack.shape[0] or
+                        rendered.shape[1] > gray_haystack.shape[1]):
+                    continue
+                h, w = rendered.shape
+                result = cv2.matchTemplate(gray_haystack, rendered, cv2.TM_CCOEFF_NORMED)
+                # bright text over dark background is negatively correlated
+                result = numpy.abs(result)
+                while True:
+                    _, max_val, _, (x, y) = cv2.minMaxLoc(result)
+                    if max_val < required_similarity:
+                        break
+                    candidates.append((min(max_val, 1.0), (x, y, w, h)))
+                    char_canvas.rectangle((x, y), (x+w, y+h), (0, 0, 255), 1)
+                    if required_similarity == 0.0:
+                        break
+                    result[max(y - h // 2, 0):y + h // 2 + 1, max(x - w // 2, 0):x + w // 2 + 1] = 0.0
+        log.debug("Found %s rendered text locations for %s fonts and %s sizes",
+                  len(candidates), len(fonts), len(sizes))
+
+        # renderings with different fonts or sizes cannot match the same text
+        accepted = []
+        for similarity, (x, y, w, h) in sorted(candidates, key=lambda c: c[0], reverse=True):
+            if any(x < x2 + w2 and x2 < x + w and y < y2 + h2 and y2 < y + h
+                   for _, (x2, y2, w2, h2) in accepted):
+                continue
+            accepted.append((similarity, (x, y, w, h)))
+            text_canvas.rectangle((x, y), (x+w, y+h), (0, 255, 0), 1)
+
+        if self.params["text"]["render_verify"].value and len(accepted) > 0:
+            img_haystack = haystack.numpy_image
+            text_imgs = (self._prepare_text_region(img_haystack, text_box) for _, text_box in accepted)
+            recognitions = self._recognize_text_regions(text_imgs)
+        else:
+            recognitions = None
+        matches = []
+        for similarity, text_box in accepted:
+            if recognitions is not None:
+                text_img, output = next(recognitions)
+                output = output.rstrip()
+                length = max(len(output), len(needle.value), 1)
+                max_distance = int((1.0 - required_similarity) * length + 1e-9)
+                ocr_similarity = 1.0 - float(needle.distance_to(output, max_distance)) / length
+                log.debug("OCR output of rendered text match = '%s' with similarity %s", output, ocr_similarity)
+                self.imglog.hotmaps.append(text_img)
+                self.imglog.similarities.append(ocr_similarity)
+                if ocr_similarity < required_similarity:
+                    continue
+            else:
+                self.imglog.similarities.append(similarity)
+            x, y, w, h = text_box
+            self.imglog.locations.append((x, y))
+            final_hotmap.rectangle((x, y), (x+w, y+h), (0, 0, 0), 2)
+            final_hotmap.rectangle((x, y), (x+w, y+h), (255, 255, 255), 1)
+            matches.append(Match(x, y, w, h, needle.center_offset.x, needle.center_offset.y, similarity))
+            if limit is not None and len(matches) >= limit:
+                break
+        if recognitions is not None:
+            recognitions.close()
+
+        self.imglog.hotmaps.append(final_hotmap)
+        if len(matches) > 0:
+            self.imglog.log(30)
+        return matches
+
+    def _render_text(self, text, font, size):
+        """
+        EXTRA DOCSTRING: Text matching backend - text rendering.
+
+        Render a text as dark over bright grayscale image tightly fitting
+        its glyphs, reusing the least recently used renderings of the same
+        text and style up to the render cache size.
+        """
+        key = (text, font, size)
+        if key in TextFinder._rendered_texts:
+            # reinsert as most recently used
+            rendered = TextFinder._rendered_texts.pop(key)
+            TextFinder._rendered_texts[key] = rendered
+            return rendered
+        import numpy
+        import PIL.ImageDraw
+        import PIL.ImageFont
+        if font == "default":
+            try:
+                pil_font = PIL.ImageFont.load_default(size)
+            except TypeError:
+                # sizing the default font requires Pillow 10.1+ so fall back to its bitmap version
+                log.warning("Rendering text with the fixed size default font instead of size %s", size)
+                pil_font = PIL.ImageFont.load_default()
+        else:
+            try:
+                font_path = FileResolver().search(font)
+            except FileNotFoundError:
+                # let PIL look for the font among the system fonts
+                font_path = font
+            pil_font = PIL.ImageFont.truetype(font_path, size)
+        left, top, right, bottom = pil_font.getbbox(text)
+        if right <= left or bottom <= top:
+            rendered = None
+        else:
+            pil_image = PIL.Image.new("L", (right - left, bottom - top), 255)
+            PIL.ImageDraw.Draw(pil_image).text((-left, -top), text, font=pil_font, fill=0)
+            rendered = numpy.array(pil_image)
+            # a uniform rendering (e.g. of whitespace only) cannot be matched
+            if rendered.min() == rendered.max():
+                rendered = None
+        TextFinder._rendered_texts[key] = rendered
+        while len(TextFinder._rendered_texts) > self.params["text"]["render_cache_size"].value:
+            del TextFinder._rendered_texts[next(iter(TextFinder._rendered_texts))]
+        return rendered
+
+    def _find_indexed(self, needle, haystack, limit=None):
+        """
+        EXTRA DOCSTRING: Text matching backend - word index lookup.
+
+        Score all windows of as many consecutive words in a text line as
+        the needle has against the needle and return the best matching
+        nonoverlapping windows.
+        """
+        from .match import Match
+        lines = self._word_index(haystack)
+        word_canvas = Hotmap(haystack.pil_image)
+        line_canvas = Hotmap(haystack.pil_image)
+        final_hotmap = Hotmap(haystack.pil_image)
+        self.imglog.hotmaps.append(word_canvas)
+        self.imglog.hotmaps.append(line_canvas)
+
+        def bounding_box(words):
+            x1 = min(box[0] for _, box in words)
+            y1 = min(box[1] for _, box in words)
+            x2 = max(box[0] + box[2] for _, box in words)
+            y2 = max(box[1] + box[3] for _, box in words)
+            return x1, y1, x2 - x1, y2 - y1
+
+        word_num = max(len(needle.value.split()), 1)
+        windows, strings = [], []
+        for i, line in enumerate(lines):
+            for _, (x, y, w, h) in line:
+                word_canvas.rectangle((x, y), (x+w, y+h), (0, 0, 255), 1)
+            x, y, w, h = bounding_box(line)
+            line_canvas.rectangle((x, y), (x+w, y+h), (0, 255, 0), 1)
+            for start in range(max(len(line) - word_num + 1, 1)):
+                window = line[start:start + word_num]
+                windows.append((i, start, start + len(window)))
+                strings.append(" ".join(text for text, _ in window))
+        log.debug("Looking up text among %s word windows of %s indexed lines", len(windows), len(lines))
+
+        required_similarity = self.params["find"]["similarity"].value
+        # a common bound for all windows which is only tight for the longest one
+        longest = max([len(needle.value)] + [len(string) for string in strings])
+        max_distance = int((1.0 - required_similarity) * longest + 1e-9)
+        scored = []
+        for window, string, distance in zip(windows, strings,
+                                            needle.distances_to(strings, max_distance)):
+            length = max(len(string), len(needle.value), 1)
+            scored.append((1.0 - float(distance) / length, window))
+        scored = sorted(scored, key=lambda x: x[0], reverse=True)
+
+        matches = []
+        accepted = []
+        for similarity, (i, start, end) in scored:
+            if similarity < required_similarity or (limit is not None and len(matches) >= limit):
+                break
+            # windows of the same line cannot share words
+            if any(i == j and start < other_end and end > other_start
+                   for j, other_start, other_end in accepted):
+                continue
+            accepted.append((i, start, end))
+            x, y, w, h = bounding_box(lines[i][start:end])
+            log.debug("Text '%s' at (%s, %s) is acceptable with similarity %s",
+                      " ".join(text for text, _ in lines[i][start:end]), x, y, similarity)
+            dx, dy = needle.center_offset.x, needle.center_offset.y
+            final_hotmap.rectangle((x, y), (x+w, y+h), (0, 0, 0), 2)
+            final_hotmap.rectangle((x, y), (x+w, y+h), (255, 255, 255), 1)
+            self.imglog.similarities.append(similarity)
+            self.imglog.locations.append((x, y))
+            matches.append(Match(x, y, w, h, dx, dy, similarity))
+        if len(matches) == 0 and len(scored) > 0:
+            # log the best achieved similarity
+            self.imglog.similarities.append(scored[0][0])
+
+        self.imglog.hotmaps.append(final_hotmap)
+        self.imglog.log(30)
+        return matches
+
+    def _word_index(self, haystack):
+        """
+        EXTRA DOCSTRING: Text matching backend - word index.
+
+        Get the text lines of the haystack as lists of words with their
+        bounding boxes recognizing the haystack only once for the same
+        pixels and OCR parameters.
+        """
+        import hashlib
+        params = tuple(sorted((name, param.value) for name, param in self.params["ocr"].items()
+                              if name not in ["backend", "workers", "cache_size"]))
+        for threshold in ["threshold2", "threshold3"]:
+            params += tuple(sorted((name, getattr(param, "value", param))
+                                   for name, param in self.params[threshold].items()))
+        key = ("words", self.params["ocr"]["backend"], self.params["text"]["datapath"].value, params)
+        # new screen captures of the same screen are also recognized only once
+        digest = haystack.derive("digest", lambda: hashlib.sha1(haystack.numpy_image).hexdigest())
+        if TextFinder._word_index_cache[:2] != (key, digest):
+            lines = haystack.derive(key, self._build_word_index, haystack)
+            TextFinder._word_index_cache = (key, digest, lines)
+        return TextFinder._word_index_cache[2]
+
+    def _build_word_index(self, haystack):
+        """
+        EXTRA DOCSTRING: Text matching backend - word level OCR.
+
+        Recognize the entire haystack at word level and group the words
+        with their bounding boxes into text lines.
+        """
+        img_haystack = haystack.numpy_image
+        # the height of the text in the entire haystack is unknown so use the fixed zoom
+        factor = self._zoom_factor(img_haystack.shape[1], img_haystack.shape[0])
+        text_img = self._prepare_text_region(img_haystack, [0, 0, img_haystack.shape[1], img_haystack.shape[0]],
+                                             zoom=factor)
+        min_confidence = self.params["ocr"]["min_confidence"].value
+
+        backend = self.params["ocr"]["backend"]
+        lines = {}
+        if backend == "pytesseract":
+            data = self.ocr.image_to_data(text_img,
+                                          lang=self.params["ocr"]["language"].value,
+                                          config=self.ocr_config,
+                                          output_type=self.ocr.Output.DICT)
+            for i, text in enumerate(data["text"]):
+                # non-word components have a confidence of -1
+                if text.strip() == "" or float(data["conf"][i]) < max(min_confidence, 0):
+                    continue
+                line = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+                box = (data["left"][i], data["top"][i], data["width"][i], data["height"][i])
+                lines.setdefault(line, []).append((text.strip(), box))
+        elif backend == "tesserocr":
+            import tesserocr
+            self.ocr.SetImage(PIL.Image.fromarray(text_img))
+            self.ocr.Recognize()
+            line = 0
+            level = tesserocr.RIL.WORD
+            for word in tesserocr.iterate_level(self.ocr.GetIterator(), level):
+                if word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                    line += 1
+                text = word.GetUTF8Text(level)
+                if text is None or text.strip() == "" or word.Confidence(level) < min_confidence:
+                    continue
+                x1, y1, x2, y2 = word.BoundingBox(level)
+                lines.setdefault(line, []).append((text.strip(), (x1, y1, x2 - x1, y2 - y1)))
+        else:
+            raise UnsupportedBackendError("The word index is only supported for pytesseract and tesserocr")
+
+        # boxes of the zoomed haystack are scaled back to the original one
+        lines = [[(text, tuple(int(round(v / factor)) for v in box)) for text, box in words]
+                 for words in lines.values()]
+        log.debug("Indexed %s words in %s text lines", sum(len(words) for words in lines), len(lines))
+        return lines
+
+    def _zoom_factor(self, width, height, text_height=None):
+        """
+        EXTRA DOCSTRING: Text matching backend - OCR zoom selection.
+
+        Select the zoom of a text region of a given size so that its letters
+        reach the optimal height for the OCR if their height is known and
+        the zoom is adaptive, or use the fixed zoom factor otherwise, only
+        limiting the zoomed region to the maximal number of pixels when the
+        zoom is adaptive.
+        """
+        factor = self.params["ocr"]["zoom_factor"].value
+        if not self.params["ocr"]["adaptive_zoom"].value:
+            return factor
+        if text_height:
+            factor = self.params["ocr"]["text_height"].value / float(text_height)
+        max_pixels = self.params["ocr"]["max_pixels"].value
+        if max_pixels > 0 and width * height * factor ** 2 > max_pixels:
+            factor = (max_pixels / float(width * height)) ** 0.5
+        return factor
+
+    def _prepare_text_region(self, img_haystack, text_box, zoom=None):
+        """
+        EXTRA DOCSTRING: Text matching backend - OCR preprocessing.
+
+        Crop, zoom, and optionally binarize and filter a detected text region
+        for improved optical character recognition, with a zoom selected from
+        the height of its text lines unless explicitly provided.
+        """
+        import cv2
+        import numpy
+
+        def binarize_step(threshold, text_img):
+            if self.params["ocr"]["binarize_text"].value:
+                first_threshold = self.params["threshold"]
+                self.params["threshold"] = self.params[threshold]
+                try:
+                    text_img = self._binarize_image(text_img)
+                finally:
+                    self.params["threshold"] = first_threshold
+                    return text_img
+            else:
+                return cv2.cvtColor(text_img, cv2.COLOR_RGB2GRAY)
+
+        # main OCR preprocessing stage
+        border = self.params["ocr"]["border_size"].value
+        text_img = img_haystack[max(text_box[1]-border,0):min(text_box[1]+text_box[3]+border,img_haystack.shape[0]),
+                                max(text_box[0]-border,0):min(text_box[0]+text_box[2]+border,img_haystack.shape[1])]
+        if zoom is not None:
+            factor = zoom
+        else:
+            # merged regions can span multiple lines so use the tallest line as letter height
+            text_height = text_box[3]
+            if self.params["ocr"]["adaptive_zoom"].value:
+                line_heights = self._text_line_heights(img_haystack, text_box)
+                if len(line_heights) > 0:
+                    text_height = max(line_heights)
+            factor = self._zoom_factor(text_img.shape[1], text_img.shape[0], text_height)
+        log.debug("Zooming x%.2f candidate for improved OCR processing", factor)
+        if factor != 1.0:
+            # shrinking large text by averaging preserves the letter strokes better
+            interpolation = cv2.INTER_AREA if factor < 1.0 else cv2.INTER_LINEAR
+            text_img = cv2.resize(text_img, None, fx=factor, fy=factor, interpolation=interpolation)
+        text_img = binarize_step("threshold2", text_img)
+        if self.params["ocr"]["distance_transform"].value:
+            text_img = cv2.distanceTransform(text_img,
+                                             self.params["ocr"]["dt_distance_type"].value,
+                                             self.params["ocr"]["dt_mask_size"].value)
+            text_img = cv2.cvtColor(numpy.asarray(text_img, dtype='uint8'), cv2.COLOR_GRAY2RGB)
+            text_img = binarize_step("threshold3", text_img)
+        if self.params["ocr"]["erode_dilate"].value < 3:
+            element = cv2.getStructuringElement(self.params["ocr"]["ed_kernel_type"].value,
+                                                (self.params["ocr"]["ed_kernel_width"].value,
+                                                 self.params["ocr"]["ed_kernel_height"].value))
+            if self.params["ocr"]["erode_dilate"].value in [0, 2]:
+                text_img = cv2.erode(text_img, element)
+            if self.params["ocr"]["erode_dilate"].value in [1, 2]:
+                text_img = cv2.dilate(text_img, element)
+        return text_img
+
+    def _recognize_text(self, text_img):
+        """
+        EXTRA DOCSTRING: Text matching backend - OCR of a single region.
+
+        Recognize the text in a preprocessed text region with the
+        synchronized OCR backend.
+        """
+        backend = self.params["ocr"]["backend"]
+        # TODO: we can do this now with pytesseract/tesserocr but have to evaluate its usefulness
+        #vector<Rect> boxes;
+        #vector<string> words;
+        #vector<float> confidences;
+        #output = ocr.run(group_img, &boxes, &words, &confidences, cv2.text.OCR_LEVEL_WORD)
+        # redirection of tesseract's streams can only be done on the file descriptor level
+        # sys.stdout = open(os.devnull, 'w')
+        if backend == "pytesseract":
+            output = self.ocr.image_to_string(text_img,
+                                              lang=self.params["ocr"]["language"].value,
+                                              config=self.ocr_config)
+            logging.debug("Running pytesseract with extra command line %s", self.ocr_config)
+        elif backend == "tesserocr":
+            self.ocr.SetImage(PIL.Image.fromarray(text_img))
+            output = self.ocr.GetUTF8Text()
+        else:
+            stdout_fd = sys.stdout.fileno() if hasattr(sys.stdout, "fileno") else 1
+            stderr_fd = sys.stderr.fileno() if hasattr(sys.stderr, "fileno") else 2
+            null_fo = open(os.devnull, 'wb')
+            with os.fdopen(os.dup(stdout_fd), 'wb') as cpout_fo:
+                with os.fdopen(os.dup(stderr_fd), 'wb') as cperr_fo:
+                    sys.stdout.flush()
+                    sys.stderr.flush()
+                    os.dup2(null_fo.fileno(), stdout_fd)
+                    os.dup2(null_fo.fileno(), stderr_fd)
+                    output = self.ocr.run(text_img, text_img,
+                                          self.params["ocr"]["min_confidence"].value,
+                                          self.params["ocr"]["component_level"].value)
+                    sys.stdout.flush()
+                    sys.stderr.flush()
+                    os.dup2(cpout_fo.fileno(), stdout_fd)
+                    os.dup2(cperr_fo.fileno(), stderr_fd)
+            null_fo.close()
+        return output
+
+    def _recognize_text_regions(self, text_imgs):
+        """
+        EXTRA DOCSTRING: Text matching backend - OCR of all regions.
+
+        Generate the preprocessed text regions with their recognized text
+        in the order of the regions.
+
+        Tesseract based backends with more than one OCR worker configured
+        recognize all regions in parallel in a pool of worker processes
+        which receive the regions through shared memory. Otherwise each
+        region is recognized only when requested which allows stopping
+        the OCR once enough matches are found. Regions with the same pixels
+        and OCR parameters as previously recognized ones reuse their output.
+        """
+        workers = self.params["ocr"]["workers"].value if "workers" in self.params["ocr"] else 1
+        if workers <= 1:
+            for text_img in text_imgs:
+                key = self._ocr_cache_key(text_img)
+                output = self._ocr_cache_get(key)
+                if output is None:
+                    output = self._recognize_text(text_img)
+                    self._ocr_cache_put(key, output)
+                yield text_img, output
+            return
+
+        import numpy
+        import concurrent.futures
+        from multiprocessing import shared_memory
+        text_imgs = [numpy.ascontiguousarray(text_img) for text_img in text_imgs]
+        keys = [self._ocr_cache_key(text_img) for text_img in text_imgs]
+        outputs = [self._ocr_cache_get(key) for key in keys]
+        unseen = [i for i, output in enumerate(outputs) if output is None]
+        if len(unseen) == 0:
+            for text_img, output in zip(text_imgs, outputs):
+                yield text_img, output
+            return
+        offsets = numpy.cumsum([0] + [text_imgs[i].nbytes for i in unseen]).tolist()
+        buffer = shared_memory.SharedMemory(create=True, size=max(offsets[-1], 1))
+        try:
+            for i, offset in zip(unseen, offsets):
+                region = numpy.ndarray(text_imgs[i].shape, dtype=text_imgs[i].dtype,
+                                       buffer=buffer.buf, offset=offset)
+                region[:] = text_imgs[i]
+                # the view must not outlive the buffer
+                del region
+            pool = self._ocr_pool(workers)
+            log.debug("Recognizing %s text regions with %s OCR workers", len(unseen), workers)
+            recognitions = {i: pool.submit(TextFinder._ocr_worker_run, buffer.name, offset,
+                                           text_imgs[i].shape, text_imgs[i].dtype.str)
+                            for i, offset in zip(unseen, offsets)}
+            try:
+                for i, text_img in enumerate(text_imgs):
+                    if outputs[i] is None:
+                        outputs[i] = recognitions[i].result()
+                        self._ocr_cache_put(keys[i], outputs[i])
+                    yield text_img, outputs[i]
+            finally:
+                for recognition in recognitions.values():
+                    recognition.cancel()
+                # running workers still read from the shared memory
+                concurrent.futures.wait(recognitions.values())
+        finally:
+            buffer.close()
+            buffer.unlink()
+
+    def _ocr_cache_key(self, text_img):
+        """
+        EXTRA DOCSTRING: Text matching backend - OCR cache key.
+
+        Identify a preprocessed text region by a hash of its pixels and the
+        OCR parameters or return None if OCR results are not cached.
+        """
+        if self.params["ocr"]["cache_size"].value == 0:
+            return None
+        import hashlib
+        import numpy
+        params = tuple(sorted((name, param.value) for name, param in self.params["ocr"].items()
+                              if name not in ["backend", "workers", "cache_size"]))
+        digest = hashlib.sha1(numpy.ascontiguousarray(text_img)).hexdigest()
+        return (self.params["ocr"]["backend"], self.params["text"]["datapath"].value, params,
+                text_img.shape, text_img.dtype.str, digest)
+
+    def _ocr_cache_get(self, key):
+        """
+        EXTRA DOCSTRING: Text matching backend - OCR cache lookup.
+
+        Get a previous OCR output for a region key or None if it is unseen.
+        """
+        if key is None:
+            return None
+        output = TextFinder._ocr_cache.pop(key, None)
+        if output is None:
+            TextFinder._ocr_misses += 1
+            return None
+        # reinsert as most recently used
+        TextFinder._ocr_cache[key] = output
+        TextFinder._ocr_hits += 1
+        return output
+
+    def _ocr_cache_put(self, key, output):
+        """
+        EXTRA DOCSTRING: Text matching backend - OCR cache update.
+
+        Store the OCR output for a region key dropping the least recently
+        used outputs beyond the cache size.
+        """
+        if key is None:
+            return
+        TextFinder._ocr_cache[key] = output
+        while len(TextFinder._ocr_cache) > self.params["ocr"]["cache_size"].value:
+            del TextFinder._ocr_cache[next(iter(TextFinder._ocr_cache))]
+
+    @staticmethod
+    def ocr_cache_info():
+        """
+        Get statistics of the OCR results cache shared by all text finders.
+
+        :returns: number of cache hits, misses, and currently cached OCR outputs
+        :rtype: (int, int, int)
+        """
+        return TextFinder._ocr_hits, TextFinder._ocr_misses, len(TextFinder._ocr_cache)
+
+    @staticmethod
+    def ocr_cache_clear():
+        """Clear the OCR results cache and reset its statistics."""
+        TextFinder._ocr_cache.clear()
+        TextFinder._ocr_hits = 0
+        TextFinder._ocr_misses = 0
+
+    def _ocr_pool(self, workers):
+        """
+        EXTRA DOCSTRING: Text matching backend - OCR worker pool.
+
+        Get a pool of warm OCR worker processes for the current OCR
+        configuration, replacing any pool for a previous one.
+        """
+        backend = self.params["ocr"]["backend"]
+        if backend not in ["pytesseract", "tesserocr"]:
+            raise UnsupportedBackendError("Parallel OCR is only supported for pytesseract and tesserocr")
+        datapath = self.params["text"]["datapath"].value
+        pool_config = (backend, os.path.join(datapath, "tessdata"),
+                       self.params["ocr"]["language"].value,
+                       self.params["ocr"]["oem"].value,
+                       self.params["ocr"]["psmode"].value,
+                       self.params["ocr"]["char_whitelist"].value,
+                       getattr(self, "ocr_config", None))
+        if TextFinder._pool_config != (pool_config, workers):
+            import concurrent.futures
+            if TextFinder._pool is not None:
+                TextFinder._pool.shutdown(wait=False)
+            if os.name == "posix":
+                # share a single tracker of the shared memory with all workers
+                from multiprocessing import resource_tracker
+                resource_tracker.ensure_running()
+            TextFinder._pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                                                                      initializer=TextFinder._ocr_worker_init,
+                                                                      initargs=pool_config)
+            TextFinder._pool_config = (pool_config, workers)
+        return TextFinder._pool
+
+    @staticmethod
+    def _ocr_worker_init(backend, tessdata, language, oem, psmode, char_whitelist, ocr_config):
+        """
+        EXTRA DOCSTRING: Text matching backend - OCR worker setup.
+
+        Create the OCR backend of a worker process once for all of its regions.
+        """
+        if backend == "tesserocr":
+            from tesserocr import PyTessBaseAPI
+            ocr = PyTessBaseAPI(path=tessdata, lang=language, oem=oem, psm=psmode)
+            ocr.SetVariable("tessedit_char_whitelist", char_whitelist)
+        else:
+            import pytesseract
+            ocr = pytesseract
+        TextFinder._worker_ocr = (backend, ocr, language, ocr_config)
+
+    @staticmethod
+    def _ocr_worker_run(buffer_name, offset, shape, dtype):
+        """
+        EXTRA DOCSTRING: Text matching backend - OCR worker task.
+
+        Recognize the text in a region read from shared memory.
+        """
+        import numpy
+        from multiprocessing import shared_memory
+        if sys.version_info >= (3, 13):
+            buffer = shared_memory.SharedMemory(name=buffer_name, track=False)
+        else:
+            # attaching would register the segment with the resource tracker as if
+            # the worker owned it (bpo-39959) leading to leak warnings and double
+            # unlinking so skip the registration since the parent unlinks it
+            from multiprocessing import resource_tracker
+            register = resource_tracker.register
+            resource_tracker.register = lambda name, rtype: None
+            try:
+                buffer = shared_memory.SharedMemory(name=buffer_name)
+            finally:
+                resource_tracker.register = register
+        try:
+            text_img = numpy.ndarray(shape, dtype=dtype, buffer=buffer.buf, offset=offset).copy()
+        finally:
+            buffer.close()
+        backend, ocr, language, ocr_config = TextFinder._worker_ocr
+        if backend == "tesserocr":
+            ocr.SetImage(PIL.Image.fromarray(text_img))
+            return ocr.GetUTF8Text()
+        else:
+            return ocr.image_to_string(text_img, lang=language, config=ocr_config)
+
     def _detect_text_east(self, haystack):
         #:.. note:: source implementation by Adrian Rosebrock from his post:
         #:   https://www.pyimagesearch.com/2018/08/20/opencv-text-detection-east-text-detector/
         import cv2
         import numpy
-        img = numpy.array(haystack.pil_image)
-        char_canvas = cv2.cvtColor(numpy.array(haystack.pil_image), cv2.COLOR_RGB2GRAY)
-        text_canvas = numpy.array(haystack.pil_image)
+        img = haystack.numpy_image
+
+        # split the image into equally sized tiles that can be processed as a batch
+        tiles = self._east_tiles(img.shape[1], img.shape[0])
+        inp_width, inp_height = self._east_resolution(tiles[0][2], tiles[0][3])
+        logging.debug("Detecting text in %s tiles at %sx%s network resolution",
+                      len(tiles), inp_width, inp_height)
+        outputs = self._east_forward([img[y:y+h, x:x+w] for x, y, w, h in tiles],
+                                     inp_width, inp_height)
+
+        def probability_map():
+            canvas = numpy.zeros((haystack.height, haystack.width), dtype=numpy.float32)
+            for (x, y, w, h), (probability, _) in zip(tiles, outputs):
+                region = canvas[y:y+h, x:x+w]
+                numpy.maximum(region, cv2.resize(probability[0, 0], (w, h)), out=region)
+            return (canvas * 255.0).astype(numpy.uint8)
+        char_canvas = Hotmap(probability_map)
+        text_canvas = Hotmap(haystack.pil_image)
         self.imglog.hotmaps.append(char_canvas)
         self.imglog.hotmaps.append(text_canvas)
 
-        # resize the image to resolution compatible with the model
-        inp_width, inp_height = (self.params["tdetect"]["input_res_x"].value,
-                                 self.params["tdetect"]["input_res_y"].value)
-        width_ratio = img.shape[1] / float(inp_width)
-        height_ratio = img.shape[0] / float(inp_height)
-        img = cv2.resize(img, (inp_width, inp_height))
+        rects, confidences = [], []
+        for (x, y, w, h), (probability, geometry) in zip(tiles, outputs):
+            tile_rects, tile_confidences = self._decode_east(probability, geometry,
+                                                             w / float(inp_width),
+                                                             h / float(inp_height))
+            rects += [[rect[0] + x, rect[1] + y, rect[2], rect[3]] for rect in tile_rects]
+            confidences += tile_confidences
+        for rect in rects:
+            char_canvas.rectangle((rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (0, 0, 0), 2)
+            char_canvas.rectangle((rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (255, 255, 255), 1)
+        logging.debug("A total of %s possible text regions found", len(rects))
+
+        # keep only the most confident of the overlapping regions
+        rects = self._suppress_nonmaxima(rects, confidences)
+        logging.debug("A total of %s text regions remain after nonmaxima suppression", len(rects))
+
+        # produce a final set of nonintersecting text regions
+        text_regions = self._merge_regions(rects)
+        for rect in text_regions:
+            text_canvas.rectangle((rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (0, 0, 0), 2)
+            text_canvas.rectangle((rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (0, 0, 255), 1)
+
+        logging.debug("A total of %s final text regions found", len(text_regions))
+        return text_regions
+
+    def _east_resolution(self, width, height):
+        """
+        EXTRA DOCSTRING: Text detection backend - EAST input resolution.
+
+        Select the network input dimensions for an image of a given size
+        as its own dimensions rounded up to multiples of 32 (the network
+        stride) if adaptive or as the configured fixed dimensions if not.
+        """
+        if not self.params["tdetect"]["adaptive_res"].value:
+            return (self.params["tdetect"]["input_res_x"].value,
+                    self.params["tdetect"]["input_res_y"].value)
+        return (max(32, -(-width // 32) * 32), max(32, -(-height // 32) * 32))
+
+    def _east_tiles(self, width, height):
+        """
+        EXTRA DOCSTRING: Text detection backend - EAST haystack tiling.
+
+        Split an image of a given size into equally sized and slightly
+        overlapping tiles no larger than the maximal input dimensions so
+        that text is detected at its original scale and the tiles can be
+        processed as a single batch.
+        """
+        if not self.params["tdetect"]["adaptive_res"].value:
+            return [(0, 0, width, height)]
+        max_res = self.params["tdetect"]["max_input_res"].value
+        # text across tile borders is detected in full in one of the tiles
+        # as long as it is smaller than the overlap
+        overlap = max_res // 8
+
+        def split(length):
+            if length <= max_res:
+                return [0], length
+            step = max_res - overlap
+            count = -(-(length - overlap) // step)
+            size = -(-(length + (count - 1) * overlap) // count)
+            return [round(i * (length - size) / (count - 1)) for i in range(count)], size
+        xs, tile_width = split(width)
+        ys, tile_height = split(height)
+        return [(x, y, tile_width, tile_height) for y in ys for x in xs]
+
+    def _east_forward(self, imgs, inp_width, inp_height):
+        """
+        EXTRA DOCSTRING: Text detection backend - EAST batched inference.
 
+        Run a single forward pass of the EAST network over a batch of
+        images at a common input resolution and return the probability
+        and geometry outputs for each image.
+        """
+        import cv2
         # convert to a model-compatible input using the mean from the training
-        inp = cv2.dnn.blobFromImage(img, mean=(123.68, 116.78, 103.94), swapRB=True, crop=False)
+        imgs = [cv2.resize(img, (inp_width, inp_height)) for img in imgs]
+        inp = cv2.dnn.blobFromImages(imgs, mean=(123.68, 116.78, 103.94), swapRB=True, crop=False)
         self.east_net.setInput(inp)
 
         # select two output layers for the EAST detector model respectivelly for
         # the output probabilities and the text bounding box coordinates
         output_layers = ["feature_fusion/Conv_7/Sigmoid", "feature_fusion/concat_3"]
-        probability, geometry = self.east_net.forward(output_layers)
-        char_canvas[:] = cv2.resize(probability[0,0]*255.0, (char_canvas.shape[1], char_canvas.shape[0]))
-
-        rects = []
-        for row in range(0, probability.shape[2]):
-            row_scores = probability[0, 0, row]
-            row_data = geometry[0, :, row]
-            for col in range(0, probability.shape[3]):
-                # prune out subthreshold probability of being a text
-                if row_scores[col] < self.params["tdetect"]["min_box_confidence"].value:
-                    continue
-                # use geometry data to get input size and rescale for final bounding box width and height
-                h = min(row_data[0][col] + row_data[2][col], inp_height) * height_ratio
-                w = min(row_data[1][col] + row_data[3][col], inp_width) * width_ratio
-                # output layer dimensions are 4x smaller than the input layer dimentions
-                (dx, dy) = (col + 1) * 4.0, (row + 1) * 4.0
-                # calculate the rotation angle from the prediction ouput
-                sin, cos = numpy.sin(row_data[4][col]), numpy.cos(row_data[4][col])
-                # compute the starting (from ending) coordinates for the text bounding box
-                x2 = min(dx + cos * row_data[1][col] + sin * row_data[2][col], inp_width) * width_ratio
-                y2 = min(dy - sin * row_data[1][col] + cos * row_data[2][col], inp_height) * height_ratio
-                # the network might give unlimited region boundaries so limit by input width/height (above)
-                x1, y1 = x2 - w, y2 - h
-
-                rect = (int(x1), int(y1), int(w), int(h))
-                cv2.rectangle(char_canvas, (rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (0, 0, 0), 2)
-                cv2.rectangle(char_canvas, (rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (255, 255, 255), 1)
-                rects.append(rect)
-                # TODO: needed for outsourced nonmaxima supression
-                # confidences.append(row_scores[x])
+        threads = self.params["tdetect"]["threads"].value
+        # the network and the process-wide OpenCV threading are not changed concurrently
+        with TextFinder._east_lock:
+            if threads <= 0:
+                probability, geometry = self.east_net.forward(output_layers)
+            else:
+                default_threads = cv2.getNumThreads()
+                cv2.setNumThreads(threads)
+                try:
+                    probability, geometry = self.east_net.forward(output_layers)
+                finally:
+                    cv2.setNumThreads(default_threads)
+        return [(probability[i:i+1], geometry[i:i+1]) for i in range(len(imgs))]
 
-        logging.debug("A total of %s possible text regions found", len(rects))
+    def _decode_east(self, probability, geometry, width_ratio, height_ratio):
+        """
+        EXTRA DOCSTRING: Text detection backend - EAST output decoding.
 
-        # produce a final set of nonintersecting text regions
-        text_regions = []
-        # TODO: apply outsourced nonmaxima suppression as the current OpenCV
-        # implementation is broken in the number of python2C++ called arguments
-        # indices = cv2.dnn.NMSBoxesRotated(rects, confidences, 0.5, 0.5, 1., 0)
-        region_queue = [[region, True] for region in rects]
-        while True:
-            # nothing to do for just one region
-            if len(region_queue) < 2:
-                break
-            r1, flag1 = region_queue.pop(0)
-            if not flag1:
-                continue
-            for r2pair in region_queue:
-                r2, _ = r2pair
-                # if the two regions intersect
-                if (r1[0] < r2[0] + r2[2] and r1[0] + r1[2] > r2[0] and
-                        r1[1] < r2[1] + r2[3] and r1[1] + r1[3] > r2[1]):
-                    r1 = [min(r1[0], r2[0]), min(r1[1], r2[1]), max(r1[2], r2[2]), max(r1[3], r2[3])]
-                    # second region will no longer be considered
-                    r2pair[1] = False
-            # first region is now merged with all intersecting regions
-            text_regions.append(r1)
-        for rect in text_regions:
-            cv2.rectangle(text_canvas, (rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (0, 0, 0), 2)
-            cv2.rectangle(text_canvas, (rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (0, 0, 255), 1)
+        Decode the score and geometry maps of the EAST network into text
+        boxes in haystack coordinates and their confidences at once for
+        all output cells above the minimal box confidence.
+        """
+        import numpy
+        # output layer dimensions are 4x smaller than the input layer dimentions
+        inp_height, inp_width = probability.shape[2] * 4, probability.shape[3] * 4
+        # prune out subthreshold probability of being a text
+        scores = probability[0, 0]
+        rows, cols = numpy.nonzero(scores >= self.params["tdetect"]["min_box_confidence"].value)
+        top, right, bottom, left, angle = geometry[0][:, rows, cols]
+        # use geometry data to get input size and rescale for final bounding box width and height
+        h = numpy.minimum(top + bottom, inp_height) * height_ratio
+        w = numpy.minimum(right + left, inp_width) * width_ratio
+        dx, dy = (cols + 1) * 4.0, (rows + 1) * 4.0
+        # calculate the rotation angle from the prediction ouput
+        sin, cos = numpy.sin(angle), numpy.cos(angle)
+        # compute the starting (from ending) coordinates for the text bounding box
+        x2 = numpy.minimum(dx + cos * right + sin * bottom, inp_width) * width_ratio
+        y2 = numpy.minimum(dy - sin * right + cos * bottom, inp_height) * height_ratio
+        # the network might give unlimited region boundaries so limit by input width/height (above)
+        x1, y1 = x2 - w, y2 - h
+
+        rects = numpy.stack([x1, y1, w, h], axis=1).astype(int).tolist()
+        return rects, scores[rows, cols].tolist()
+
+    def _suppress_nonmaxima(self, rects, confidences):
+        """
+        EXTRA DOCSTRING: Text detection backend - nonmaxima suppression.
 
-        logging.debug("A total of %s final text regions found", len(text_regions))
-        return text_regions
+        Keep the most confident of all boxes overlapping by more than the
+        configured intersection over union, ordered by confidence.
+        """
+        import numpy
+        if len(rects) == 0:
+            return []
+        boxes = numpy.array(rects, dtype=numpy.float64).reshape(-1, 4)
+        x1, y1 = boxes[:, 0], boxes[:, 1]
+        x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+        areas = boxes[:, 2] * boxes[:, 3]
+        threshold = self.params["tdetect"]["nms_threshold"].value
+
+        # the order is stable to keep the scanning order for equal confidences
+        order = numpy.argsort(-numpy.asarray(confidences, dtype=numpy.float64), kind="stable")
+        kept = []
+        while len(order) > 0:
+            best, rest = order[0], order[1:]
+            kept.append(best)
+            width = numpy.maximum(numpy.minimum(x2[best], x2[rest]) - numpy.maximum(x1[best], x1[rest]), 0)
+            height = numpy.maximum(numpy.minimum(y2[best], y2[rest]) - numpy.maximum(y1[best], y1[rest]), 0)
+            intersection = width * height
+            union = areas[best] + areas[rest] - intersection
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                overlap = numpy.where(union > 0, intersection / union, 0.0)
+            order = rest[overlap <= threshold]
+        return [rects[i] for i in kept]
+
+    def _merge_regions(self, rects):
+        """
+        EXTRA DOCSTRING: Text detection backend - region merging.
+
+        Merge all (also transitively) intersecting regions into their
+        bounding boxes until no two of the final regions intersect.
+
+        Each merging pass sweeps over the regions sorted by their left
+        border keeping only the regions not yet ended along the sweep
+        and joins intersecting regions in a union-find structure. The
+        final regions keep the order of their first original region.
+        """
+        import heapq
+        regions = [list(rect) for rect in rects]
+        while True:
+            parents = list(range(len(regions)))
+
+            def find(i):
+                while parents[i] != i:
+                    parents[i] = parents[parents[i]]
+                    i = parents[i]
+                return i
+
+            # heap of the right borders of regions still crossing the sweep line
+            active = []
+            for i in sorted(range(len(regions)), key=lambda i: regions[i][0]):
+                x, y, w, h = regions[i]
+                while len(active) > 0 and active[0][0] <= x:
+                    heapq.heappop(active)
+                for _, j in active:
+                    xj, yj, wj, hj = regions[j]
+                    # if the two regions intersect
+                    if x < xj + wj and x + w > xj and y < yj + hj and y + h > yj:
+                        parents[find(j)] = find(i)
+                heapq.heappush(active, (x + w, i))
+
+            groups = {}
+            for i in range(len(regions)):
+                groups.setdefault(find(i), []).append(i)
+            if len(groups) == len(regions):
+                return regions
+            merged = []
+            for members in groups.values():
+                x1 = min(regions[i][0] for i in members)
+                y1 = min(regions[i][1] for i in members)
+                x2 = max(regions[i][0] + regions[i][2] for i in members)
+                y2 = max(regions[i][1] + regions[i][3] for i in members)
+                merged.append([x1, y1, x2 - x1, y2 - y1])
+            # merged bounding boxes might intersect further regions
+            regions = merged
 
     def _detect_text_erstat(self, haystack):
         import cv2
         import numpy
-        img = numpy.array(haystack.pil_image)
-        char_canvas = numpy.array(haystack.pil_image)
-        text_canvas = numpy.array(haystack.pil_image)
+        img = haystack.numpy_image
+        char_canvas = Hotmap(haystack.pil_image)
+        text_canvas = Hotmap(haystack.pil_image)
         self.imglog.hotmaps.append(char_canvas)
         self.imglog.hotmaps.append(text_canvas)
 
-        # extract channels to be processed individually - B, G, R, lightness, and gradient magnitude
-        channels = cv2.text.computeNMChannels(img)
+        # extract channels to be processed individually - R, G, B, lightness, and gradient magnitude
+        channels = list(cv2.text.computeNMChannels(img))
         # append negative channels to detect ER- (bright regions over dark background) skipping the gradient channel
         channel_num_without_grad = len(channels)-1
         for i in range(0, channel_num_without_grad):
             channels.append(255-channels[i])
-
-        char_regions = []
-        text_regions = []
-        # apply the default cascade classifier to each independent channel
+        channel_names = "RGBLMrgbl"
+        selection = self.params["tdetect"]["channels"].value
+        unknown = set(selection) - set(channel_names)
+        if len(unknown) > 0:
+            raise UnsupportedBackendError("Unsupported ERStat channels %s, use any of %s" %
+                                          ("".join(sorted(unknown)), channel_names))
+        channels = [(i, channels[i]) for i, name in enumerate(channel_names) if name in selection]
+
+        # apply the default cascade classifier to each independent channel concurrently
+        # (the OpenCV calls release the GIL) and merge the results in channel order
         log.debug("Extracting class specific extremal regions from %s channels", len(channels))
-        for i, channel in enumerate(channels):
+        text_regions = []
+        if len(channels) == 0:
+            return text_regions
+        import concurrent.futures
+        import queue
+        workers = min(len(channels), os.cpu_count() or 1)
+        # the ER filters keep state between runs so each worker needs its own pair
+        # which is built once and reused for all of its channels and later detections
+        while len(self.erfilters) < workers:
+            self.erfilters.append(self._create_erstat_filters())
+        filters = queue.Queue()
+        for pair in self.erfilters[:workers]:
+            filters.put(pair)
+
+        def detect_channel(i, channel):
+            erf1, erf2 = filters.get()
+            try:
+                return self._detect_channel_erstat(img, i, channel, erf1, erf2)
+            finally:
+                filters.put((erf1, erf2))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda c: detect_channel(*c), channels))
+        for regions, region_groups in results:
+            for rect in (cv2.boundingRect(p.reshape(-1, 1, 2)) for p in regions):
+                char_canvas.rectangle((rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (0, 0, 0), 2)
+                char_canvas.rectangle((rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (0, 0, 255), 1)
+            for rect in region_groups:
+                text_canvas.rectangle((rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (0, 0, 0), 2)
+                text_canvas.rectangle((rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (0, 255, 0), 1)
+            text_regions.extend(region_groups)
 
-            # one liner for "erf1.run(channel)" then "erf2.run(channel)"
-            regions = cv2.text.detectRegions(channel, self.erf1, self.erf2)
-            logging.debug("A total of %s possible character regions found on channel %s", len(regions), i)
-            rects = [cv2.boundingRect(p.reshape(-1, 1, 2)) for p in regions]
-            for rect in rects:
-                cv2.rectangle(char_canvas, (rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (0, 0, 0), 2)
-                cv2.rectangle(char_canvas, (rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (0, 0, 255), 1)
+        # produce a final set of nonintersecting text regions
+        return self._merge_regions(text_regions)
 
-            if len(regions) == 0:
-                continue
+    def _create_erstat_filters(self):
+        """
+        EXTRA DOCSTRING: Text detection backend - ERStat filter pair.
 
-            region_groups = cv2.text.erGrouping(img, channel, [r.tolist() for r in regions])
-            logging.debug("A total of %s possible text regions found on channel %s", len(region_groups), i)
-            for rect in region_groups:
-                cv2.rectangle(text_canvas, (rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (0, 0, 0), 2)
-                cv2.rectangle(text_canvas, (rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (0, 255, 0), 1)
+        :returns: first and second stage ER filters from the current parameters
+        :rtype: (:py:class:`cv2.text_ERFilter`, :py:class:`cv2.text_ERFilter`)
+        """
+        import cv2
+        erf1 = cv2.text.createERFilterNM1(self.erc1,
+                                          self.params["tdetect"]["thresholdDelta"].value,
+                                          self.params["tdetect"]["minArea"].value,
+                                          self.params["tdetect"]["maxArea"].value,
+                                          self.params["tdetect"]["minProbability"].value,
+                                          self.params["tdetect"]["nonMaxSuppression"].value,
+                                          self.params["tdetect"]["minProbabilityDiff"].value)
+        erf2 = cv2.text.createERFilterNM2(self.erc2, self.params["tdetect"]["minProbability2"].value)
+        return erf1, erf2
+
+    def _detect_channel_erstat(self, img, i, channel, erf1, erf2):
+        """
+        EXTRA DOCSTRING: Text detection backend - ERStat single channel.
 
-            char_regions.extend(regions)
-            text_regions.extend(region_groups)
+        Extract the character regions of a single channel and group them
+        into text regions, using a filter pair owned by the current worker.
+        """
+        import cv2
+        # one liner for "erf1.run(channel)" then "erf2.run(channel)"
+        regions = cv2.text.detectRegions(channel, erf1, erf2)
+        logging.debug("A total of %s possible character regions found on channel %s", len(regions), i)
+        if len(regions) == 0:
+            return regions, []
 
-        # produce a final set of nonintersecting text regions
-        final_regions = []
-        region_queue = [[region, True] for region in text_regions]
-        while True:
-            # nothing to do for just one region
-            if len(region_queue) < 2:
-                break
-            r1, flag1 = region_queue.pop(0)
-            if not flag1:
-                continue
-            for r2pair in region_queue:
-                r2, _ = r2pair
-                # if the two regions intersect
-                if (r1[0] < r2[0] + r2[2] and r1[0] + r1[2] > r2[0] and
-                        r1[1] < r2[1] + r2[3] and r1[1] + r1[3] > r2[1]):
-                    r1 = [min(r1[0], r2[0]), min(r1[1], r2[1]), max(r1[2], r2[2]), max(r1[3], r2[3])]
-                    # second region will no longer be considered
-                    r2pair[1] = False
-            # first region is now merged with all intersecting regions
-            final_regions.append(r1)
-        return final_regions
+        region_groups = cv2.text.erGrouping(img, channel, [r.tolist() for r in regions])
+        logging.debug("A total of %s possible text regions found on channel %s", len(region_groups), i)
+        return regions, list(region_groups)
 
     def _detect_text_contours(self, haystack):
         import cv2
         import numpy
-        img = numpy.array(haystack.pil_image)
-        char_canvas = numpy.array(haystack.pil_image)
-        text_canvas = numpy.array(haystack.pil_image)
+        char_canvas = Hotmap(haystack.pil_image)
+        text_canvas = Hotmap(haystack.pil_image)
         self.imglog.hotmaps.append(char_canvas)
         self.imglog.hotmaps.append(text_canvas)
 
-        thresh_haystack = self._binarize_image(img)
+        thresh_haystack = self._binarize_target(haystack)
         countours_haystack = thresh_haystack.copy()
         haystack_contours = self._extract_contours(countours_haystack)
 
@@ -2405,53 +4010,81 @@ class TextFinder(ContourFinder):
                           w, h, area, w, h, ratio)
                 continue
             else:
-                cv2.rectangle(char_canvas, (x,y), (x+w,y+h), (0, 0, 0), 2)
-                cv2.rectangle(char_canvas, (x,y), (x+w,y+h), (0, 0, 255), 1)
+                char_canvas.rectangle((x,y), (x+w,y+h), (0, 0, 0), 2)
+                char_canvas.rectangle((x,y), (x+w,y+h), (0, 0, 255), 1)
                 char_regions.append([x, y, w, h])
-        char_regions = sorted(char_regions, key=lambda x:x[0])
 
         # group characters into horizontally-correlated regions
-        text_regions = []
+        text_regions = self._group_characters(char_regions)
+        for x, y, w, h in text_regions:
+            text_canvas.rectangle((x, y), (x+w,y+h), (0, 0, 0), 2)
+            text_canvas.rectangle((x, y), (x+w,y+h), (0, 255, 0), 1)
+
+        return text_regions
+
+    def _group_characters(self, char_regions):
+        """
+        EXTRA DOCSTRING: Text detection backend - character grouping.
+
+        Group character regions into text regions along the text orientation.
+
+        The characters are swept in order along the text orientation and
+        joined to the first still open text line of similar position and
+        size across the orientation which ends close enough before them.
+        Open text lines are bucketed in a grid by their position across the
+        orientation so that only lines in neighboring grid cells are compared.
+        """
         dx, dy = self.params["tdetect"]["horizontalSpacing"].value, self.params["tdetect"]["verticalVariance"].value
         text_orientation = self.params["tdetect"]["orientation"].value
         min_chars_for_text = self.params["tdetect"]["minChars"].value
-        for i, region1 in enumerate(char_regions):
-            # region was already merged
-            if region1 is None:
+        if text_orientation == 1:
+            # vertical text is grouped as horizontal text with swapped axes
+            char_regions = [[y, x, h, w] for x, y, w, h in char_regions]
+            dx, dy = dy, dx
+        cell = max(dy, 1)
+
+        # text lines as [x, y, w, h, number of joined characters]
+        lines = []
+        grid = {}
+        for x2, y2, w2, h2 in sorted(char_regions, key=lambda r: r[0]):
+            joined = None
+            for row in range(int((y2 - dy) // cell), int((y2 + dy) // cell) + 1):
+                open_lines = grid.get(row, [])
+                for line_index in list(open_lines):
+                    x1, y1, w1, h1, _ = lines[line_index]
+                    # the sweep has passed beyond any further characters of the line
+                    if x2 - (x1 + w1) >= dx:
+                        open_lines.remove(line_index)
+                        continue
+                    if (x1 - (x2 + w2) < dx and abs(y1 - y2) < dy and abs(h1 - h2) < 2*dy and
+                            (joined is None or line_index < joined)):
+                        joined = line_index
+            if joined is None:
+                lines.append([x2, y2, w2, h2, 0])
+                grid.setdefault(int(y2 // cell), []).append(len(lines) - 1)
                 continue
-            chars_for_text = 0
-            for j, region2 in enumerate(char_regions):
-                # region is compared to itself or to merged region
-                if region1 == region2 or region2 is None:
-                    continue
-                x1, y1, w1, h1 = region1
-                x2, y2, w2, h2 = region2
-                if text_orientation == 0:
-                    is_text = x2 - (x1 + w1) < dx and x1 - (x2 + w2) < dx and abs(y1 - y2) < dy and abs(h1 - h2) < 2*dy
-                elif text_orientation == 1:
-                    is_text = y2 - (y1 + h1) < dy and y1 - (y2 + h2) < dy and abs(x1 - x2) < dx and abs(w1 - w2) < 2*dx
-                if is_text:
-                    region1 = [min(x1,x2), min(y1,y2), max(x1+w1,x2+w2)-min(x1,x2), max(y1+h1,y2+h2)-min(y1,y2)]
-                    chars_for_text += 1
-                    char_regions[j] = None
+            x1, y1, w1, h1, chars_for_text = lines[joined]
+            region = [min(x1,x2), min(y1,y2), max(x1+w1,x2+w2)-min(x1,x2), max(y1+h1,y2+h2)-min(y1,y2)]
+            lines[joined] = region + [chars_for_text + 1]
+            if int(region[1] // cell) != int(y1 // cell):
+                grid[int(y1 // cell)].remove(joined)
+                grid.setdefault(int(region[1] // cell), []).append(joined)
+
+        text_regions = []
+        for x, y, w, h, chars_for_text in lines:
             if chars_for_text < min_chars_for_text:
                 log.debug("Ignoring text contour with %s<%s characters",
                           chars_for_text, min_chars_for_text)
                 continue
-            x, y, w, h = region1
-            cv2.rectangle(text_canvas, (x, y), (x+w,y+h), (0, 0, 0), 2)
-            cv2.rectangle(text_canvas, (x, y), (x+w,y+h), (0, 255, 0), 1)
-            text_regions.append(region1)
-            char_regions[i] = None
-
+            text_regions.append([y, x, h, w] if text_orientation == 1 else [x, y, w, h])
         return text_regions
 
     def _detect_text_components(self, haystack):
         import cv2
         import numpy
-        img = numpy.array(haystack.pil_image)
-        char_canvas = numpy.array(haystack.pil_image)
-        text_canvas = numpy.array(haystack.pil_image)
+        img = haystack.numpy_image
+        char_canvas = Hotmap(haystack.pil_image)
+        text_canvas = Hotmap(haystack.pil_image)
         self.imglog.hotmaps.append(char_canvas)
         self.imglog.hotmaps.append(text_canvas)
 
@@ -2459,7 +4092,7 @@ class TextFinder(ContourFinder):
         label_num, label_img, stats, centroids = cv2.connectedComponentsWithStats(img, connectivity, cv2.CV_32S)
         logging.debug("Detected %s component labels with centroids: %s", label_num,
                       ", ".join([str((int(c[0]),int(c[1]))) for c in centroids]))
-        self.imglog.hotmaps.append(label_img * 255)
+        self.imglog.hotmaps.append(Hotmap(lambda: label_img * 255))
         for i in range(label_num):
             x, y = stats[i,cv2.CC_STAT_LEFT], stats[i,cv2.CC_STAT_TOP]
             w, h = stats[i,cv2.CC_STAT_WIDTH], stats[i,cv2.CC_STAT_HEIGHT]
@@ -2468,11 +4101,11 @@ class TextFinder(ContourFinder):
                 continue
             else:
                 rect = [x, y, w, h]
-                cv2.rectangle(char_canvas, (rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (0, 0, 0), 2)
-                cv2.rectangle(char_canvas, (rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (0, 0, 255), 1)
+                char_canvas.rectangle((rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (0, 0, 0), 2)
+                char_canvas.rectangle((rect[0],rect[1]), (rect[0]+rect[2],rect[1]+rect[3]), (0, 0, 255), 1)
 
         # TODO: log here since not fully implemented
-        self.imglog.hotmaps[-1] = cv2.normalize(label_img, label_img, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
+        self.imglog.hotmaps[-1] = Hotmap(lambda: cv2.normalize(label_img, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U))
         self.imglog.log(30)
         raise NotImplementedError("The connected components method for text detection needs more labels")
 
@@ -2606,7 +4239,7 @@ class TemplateFeatureFinder(TemplateFinder, FeatureFinder):
                                   feature_match=feature_match,
                                   reset=False)
 
-    def find(self, needle, haystack):
+    def find(self, needle, haystack, limit=None):
         """
         Custom implementation of the base method.
 
@@ -2636,32 +4269,53 @@ class TemplateFeatureFinder(TemplateFinder, FeatureFinder):
         self.params["find"]["similarity"].value = feature_similarity
         # dump correct matching settings
         self.imglog.dump_matched_images()
-        ngray = cv2.cvtColor(numpy.array(needle.pil_image), cv2.COLOR_RGB2GRAY)
-        hgray = cv2.cvtColor(numpy.array(haystack.pil_image), cv2.COLOR_RGB2GRAY)
-        final_hotmap = numpy.array(haystack.pil_image)
+        ngray = needle.gray_image
+        hgray = haystack.gray_image
+        final_hotmap = Hotmap(haystack.pil_image)
 
         frame_points = [(0, 0)]
         feature_maxima = []
-        is_feature_poor = False
-        for i, upleft in enumerate(template_maxima):
-            up = upleft.y
-            down = min(haystack.height, up + needle.height)
-            left = upleft.x
-            right = min(haystack.width, left + needle.width)
+        # feature poor needles are known in advance and skip the feature stage
+        is_feature_poor = self._is_feature_poor(needle, ngray)
+        if is_feature_poor:
+            log.debug("Feature poor needle, skipping the feature matching stage")
+        windows = [(upleft.x, upleft.y,
+                    min(haystack.width, upleft.x + needle.width),
+                    min(haystack.height, upleft.y + needle.height))
+                   for upleft in template_maxima]
+        hotmap_regions = [Hotmap(functools.partial(haystack.pil_image.crop, window))
+                          for window in windows]
+        verifications, executor = [], None
+        if not is_feature_poor and len(windows) > 0:
+            # verify all candidates concurrently (the heavy OpenCV calls release the GIL)
+            # and merge their results below in the order of the template matching
+            import concurrent.futures
+            workers = min(len(windows), os.cpu_count() or 1)
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+            verifications = [executor.submit(self._verify_candidate, frame_points, ngray, hgray,
+                                             window, hotmap_region, feature_similarity,
+                                             haystack.pil_image, needle.filename,
+                                             self._needle_digest(needle))
+                             for window, hotmap_region in zip(windows, hotmap_regions)]
+        for i, (left, up, right, down) in enumerate(windows):
             log.log(9, "Maximum up-down is %s and left-right is %s",
                     (up, down), (left, right))
 
-            haystack_region = hgray[up:down, left:right]
-            haystack_region = haystack_region.copy()
-            hotmap_region = final_hotmap[up:down, left:right]
-            hotmap_region = hotmap_region.copy()
+            hotmap_region = hotmap_regions[i]
             # four smaller hotmaps for the feature matching stages (draw on same image here)
             self.imglog.hotmaps.append(hotmap_region)
             self.imglog.hotmaps.append(hotmap_region)
             self.imglog.hotmaps.append(hotmap_region)
             self.imglog.hotmaps.append(hotmap_region)
+            if len(verifications) == 0:
+                # keep the logging consistent with the template result as feature one
+                self.imglog.similarities.append(self.imglog.similarities[i])
+                self.imglog.locations.append((left, up))
+                continue
 
-            res = self._project_features(frame_points, ngray, haystack_region, feature_similarity)
+            res, similarity, location = verifications[i].result()
+            self.imglog.similarities.append(similarity)
+            self.imglog.locations.append(location)
             # if the feature matching succeeded or is worse than satisfactory template matching
             if res != None or (self.imglog.similarities[-1] > 0.0 and
                                self.imglog.similarities[-1] < self.imglog.similarities[i] and
@@ -2677,12 +4331,28 @@ class TemplateFeatureFinder(TemplateFinder, FeatureFinder):
                                        self.imglog.similarities[-1],
                                        self.imglog.locations[-1]])
                 # stitch back for a better final image logging
-                final_hotmap[up:down, left:right] = hotmap_region
+                final_hotmap.paste(hotmap_region, (left, up))
 
             # if similarity is not zero but we have no result, we failed the comparison
             elif self.imglog.similarities[-1] == 0.0:
                 is_feature_poor = True
 
+            if limit is not None and len(feature_maxima) >= limit and not is_feature_poor:
+                log.debug("Stopping feature matching at the required %s matches", limit)
+                # drop the unverified template maxima to keep the logging consistent
+                verified = i + 1
+                del self.imglog.similarities[verified:len(template_maxima)]
+                del self.imglog.locations[verified:len(template_maxima)]
+                del self.imglog.hotmaps[verified:len(template_maxima)]
+                template_maxima = template_maxima[:verified]
+                for verification in verifications[verified:]:
+                    verification.cancel()
+                break
+        if executor is not None:
+            # wait for candidates that are already being verified (the rest are cancelled)
+            # so that no verification outlives the current find
+            executor.shutdown(wait=True)
+
         # if at least one match is feature poor, we cannot rely on feature matching
         if is_feature_poor:
             log.warn("Feature poor needle detected, falling back to template matching")
@@ -2724,8 +4394,8 @@ class TemplateFeatureFinder(TemplateFinder, FeatureFinder):
             x, y = maximum[2]
             w, h = needle.width, needle.height
             dx, dy = needle.center_offset.x, needle.center_offset.y
-            cv2.rectangle(final_hotmap, (x,y), (x+needle.width,y+needle.height), (0,0,0), 2)
-            cv2.rectangle(final_hotmap, (x,y), (x+needle.width,y+needle.height), (0,0,255), 1)
+            final_hotmap.rectangle((x,y), (x+needle.width,y+needle.height), (0,0,0), 2)
+            final_hotmap.rectangle((x,y), (x+needle.width,y+needle.height), (0,0,255), 1)
             matches.append(Match(x, y, w, h, dx, dy, similarity))
         self.imglog.hotmaps.append(final_hotmap)
         # log one best match for final hotmap filename
@@ -2736,6 +4406,49 @@ class TemplateFeatureFinder(TemplateFinder, FeatureFinder):
         self.imglog.log(30)
         return matches
 
+    def _verify_candidate(self, frame_points, ngray, hgray, window, hotmap,
+                          similarity, hsource=None, nfile=None, ndigest=None):
+        """
+        EXTRA DOCSTRING: Template-feature matching backend - candidate verification.
+
+        Verify a single template matching candidate with feature matching.
+
+        The verification is performed on a shallow copy of the finder with
+        its own image logger so that multiple candidates can be verified
+        concurrently, returning the projected locations (or None), the
+        feature similarity and the last logged location for the candidate.
+        """
+        left, up, right, down = window
+        verifier = copy.copy(self)
+        verifier.imglog = ImageLogger()
+        # four smaller hotmaps for the feature matching stages (draw on same image here)
+        verifier.imglog.hotmaps = [hotmap] * 4
+        haystack_region = hgray[up:down, left:right].copy()
+        res = verifier._project_features(frame_points, ngray, haystack_region, similarity,
+                                         hframe=(hsource, window), nfile=nfile, ndigest=ndigest)
+        return res, verifier.imglog.similarities[-1], verifier.imglog.locations[-1]
+
+    def _is_feature_poor(self, needle, ngray):
+        """
+        EXTRA DOCSTRING: Template-feature matching backend - needle analysis.
+
+        Check whether the needle has too few features for the feature stage.
+
+        The analysis is kept with the needle image and thus performed only
+        once for the same needle and detection and extraction parameters.
+        """
+        self.synchronize_backend(category="fdetect")
+        self.synchronize_backend(category="fextract")
+
+        def analyze():
+            nkeypoints, _ = self._detect_needle_features(ngray, needle.filename,
+                                                         self._needle_digest(needle))
+            log.log(9, "Needle has %s features", len(nkeypoints))
+            return len(nkeypoints) < self.params["feature"]["minDetectedFeatures"].value
+        key = ("feature_poor", repr(self._features_key()),
+               self.params["feature"]["minDetectedFeatures"].value)
+        return needle.derive(key, analyze)
+
     def log(self, lvl):
         """
         Custom implementation of the base method.
@@ -2917,7 +4630,7 @@ class DeepFinder(Finder):
         """
         self.__synchronize_backend(backend, category, reset)
 
-    def find(self, needle, haystack):
+    def find(self, needle, haystack, limit=None):
         """
         Custom implementation of the base method.
 
@@ -2932,9 +4645,9 @@ class DeepFinder(Finder):
         self.imglog.haystack = haystack
         self.imglog.dump_matched_images()
         # prepare a canvas solely for image logging
-        full_hotmap = haystack.pil_image.copy()
-        filtered_hotmap = haystack.pil_image.copy()
-        final_hotmap = haystack.pil_image.copy()
+        full_hotmap = Hotmap(haystack.pil_image)
+        filtered_hotmap = Hotmap(haystack.pil_image)
+        final_hotmap = Hotmap(haystack.pil_image)
         needle_class = needle.id
         similarity = self.params["find"]["similarity"].value
         backend = self.params["deep"]["backend"]
@@ -2975,29 +4688,27 @@ class DeepFinder(Finder):
             x, y, w, h =  list(pred[0]['boxes'][i].cpu().numpy())
             rect = (int(x), int(y), int(x+w), int(y+h))
 
-            from PIL import ImageDraw
-            draw = ImageDraw.Draw(full_hotmap)
-            draw.rectangle(rect, outline=(255,0,0))
-            draw.text((rect[0], rect[1]), label, fill=(255,0,0,0))
+            full_hotmap.rectangle(rect[:2], rect[2:], (255,0,0))
+            full_hotmap.text(rect[:2], label, (255,0,0))
             if score < similarity:
                 logging.debug("Found %s has a low confidence score %s<%s, skipping",
                               label, score, similarity)
                 continue
-            draw = ImageDraw.Draw(filtered_hotmap)
-            draw.rectangle(rect, outline=(0,255,0))
-            draw.text((rect[0], rect[1]), label, fill=(0,255,0,0))
+            filtered_hotmap.rectangle(rect[:2], rect[2:], (0,255,0))
+            filtered_hotmap.text(rect[:2], label, (0,255,0))
             if label != needle_class:
                 logging.debug("Found %s is not %s, skipping", label, needle_class)
                 continue
             logging.debug("Found %s with sufficient confidence %s at (%s, %s)",
                           label, score, x, y)
-            draw = ImageDraw.Draw(final_hotmap)
-            draw.rectangle(rect, outline=(0,0,255))
+            final_hotmap.rectangle(rect[:2], rect[2:], (0,0,255))
 
             self.imglog.locations.append((x, y))
             self.imglog.similarities.append(score)
             dx, dy = needle.center_offset.x, needle.center_offset.y
             matches.append(Match(*rect, dx, dy, score))
+            if limit is not None and len(matches) >= limit:
+                break
 
         self.imglog.hotmaps.append(full_hotmap)
         self.imglog.hotmaps.append(filtered_hotmap)
@@ -3119,7 +4830,7 @@ class HybridFinder(Finder):
         """
         self.__synchronize_backend(backend, category, reset)
 
-    def find(self, needle, haystack):
+    def find(self, needle, haystack, limit=None):
         """
         Custom implementation of the base method.
 
@@ -3139,7 +4850,7 @@ class HybridFinder(Finder):
             else:
                 matcher = self.matcher
 
-            matches = matcher.find(step_needle, haystack)
+            matches = matcher.find(step_needle, haystack, limit=limit)
             if len(matches) > 0:
                 return matches
 
@@ -30,7 +30,7 @@ class ImageLogger(object):
     similarity and the matched coordinates.
 
     Generally, each finder class takes care of its own image logging,
-    performing drawing or similar operations on the spot and deciding
+    recording drawing or similar operations on lazy hotmaps and deciding
     which hotmaps (also their names and order) to dump.
     """
 
@@ -72,6 +72,16 @@ class ImageLogger(object):
         return ("%0" + str(ImageLogger.step_width) + "d") % ImageLogger.step
     printable_step = property(fget=get_printable_step)
 
+    def get_active(self):
+        """
+        Getter for readonly attribute.
+
+        :returns: whether any images will be dumped at the current logging level
+        :rtype: bool
+        """
+        return ImageLogger.logging_level <= 30
+    active = property(fget=get_active)
+
     def debug(self):
         """Log images with a DEBUG logging level."""
         self.log(10)
@@ -99,7 +109,7 @@ class ImageLogger(object):
         The current needle and haystack (matched images) are stored
         as `needle` and `haystack` attributes.
         """
-        if ImageLogger.logging_level > 30:
+        if not self.active:
             return
         if not os.path.exists(ImageLogger.logging_destination):
             os.mkdir(ImageLogger.logging_destination)
@@ -125,14 +135,17 @@ class ImageLogger(object):
 
         :param str name: filename to use for the image
         :param hotmap: image (with matching results) to write
-        :type hotmap: :py:class:`PIL.Image` or :py:class:`numpy.ndarray`
+        :type hotmap: :py:class:`Hotmap` or :py:class:`PIL.Image` or :py:class:`numpy.ndarray`
         """
-        if ImageLogger.logging_level > 30:
+        if not self.active:
             return
         if not os.path.exists(ImageLogger.logging_destination):
             os.mkdir(ImageLogger.logging_destination)
         path = os.path.join(ImageLogger.logging_destination, name)
 
+        if isinstance(hotmap, Hotmap):
+            # lazy hotmaps are only drawn when actually dumped
+            hotmap = hotmap.render()
         if isinstance(hotmap, PIL.Image.Image):
             pil_image = hotmap
         else:
@@ -150,3 +163,161 @@ class ImageLogger(object):
         self.hotmaps = []
         self.similarities = []
         self.locations = []
+
+
+class Hotmap(object):
+    """
+    Lazy hotmap recording drawing operations on top of a source image.
+
+    The actual canvas is created and drawn on only when the hotmap is
+    rendered, i.e. when it is dumped by the image logger, so that no
+    image copies are made if image logging is disabled.
+
+    A source in the form of a PIL image is drawn on using PIL while
+    a numpy array source is drawn on using OpenCV.
+    """
+
+    def __init__(self, source, gray=False):
+        """
+        Build a lazy hotmap.
+
+        :param source: image to draw on or a function producing such an image
+        :type source: :py:class:`PIL.Image` or :py:class:`numpy.ndarray` or callable
+        :param bool gray: whether to draw on a grayscale version of the source
+        """
+        self.source = source
+        self.gray = gray
+        self.drawings = []
+
+    def rectangle(self, upleft, downright, color, thickness=1):
+        """
+        Record a rectangle to draw.
+
+        :param upleft: upper left corner of the rectangle
+        :type upleft: (int, int)
+        :param downright: lower right corner of the rectangle
+        :type downright: (int, int)
+        :param color: RGB color of the rectangle
+        :type color: (int, int, int)
+        :param int thickness: thickness of the rectangle outline
+        """
+        self.drawings.append(("rectangle", upleft, downright, color, thickness))
+
+    def circle(self, center, radius, color, thickness=1):
+        """
+        Record a circle to draw.
+
+        :param center: center of the circle
+        :type center: (int, int)
+        :param int radius: radius of the circle
+        :param color: RGB color of the circle
+        :type color: (int, int, int)
+        :param int thickness: thickness of the circle outline
+        """
+        self.drawings.append(("circle", center, radius, color, thickness))
+
+    def contours(self, contours, color):
+        """
+        Record contours to draw.
+
+        :param contours: contours as arrays of points
+        :type contours: [:py:class:`numpy.ndarray`]
+        :param color: RGB color of the contours
+        :type color: (int, int, int)
+        """
+        self.drawings.append(("contours", contours, color))
+
+    def text(self, location, text, color):
+        """
+        Record a text label to draw.
+
+        :param location: upper left corner of the text
+        :type location: (int, int)
+        :param str text: text to draw
+        :param color: RGB color of the text
+        :type color: (int, int, int)
+        """
+        self.drawings.append(("text", location, text, color))
+
+    def paste(self, hotmap, upleft):
+        """
+        Record another (smaller) hotmap to paste over this one.
+
+        :param hotmap: hotmap to paste
+        :type hotmap: :py:class:`Hotmap`
+        :param upleft: upper left corner of the pasted hotmap
+        :type upleft: (int, int)
+        """
+        self.drawings.append(("paste", hotmap, upleft))
+
+    def render(self):
+        """
+        Create the canvas and perform all recorded drawings.
+
+        :returns: image with all drawings on it
+        :rtype: :py:class:`PIL.Image` or :py:class:`numpy.ndarray`
+        """
+        if callable(self.source):
+            canvas = self.source()
+        else:
+            canvas = self.source.copy()
+
+        if isinstance(canvas, PIL.Image.Image):
+            if self.gray:
+                canvas = canvas.convert('L')
+            self._draw_pil(canvas)
+        else:
+            import cv2
+            if self.gray:
+                canvas = cv2.cvtColor(canvas, cv2.COLOR_RGB2GRAY)
+            self._draw_cv(canvas)
+        return canvas
+
+    def _draw_pil(self, canvas):
+        from PIL import ImageDraw
+        draw = ImageDraw.Draw(canvas)
+        # single channel canvases use only the first color component as in OpenCV
+        ink = (lambda color: color) if canvas.mode == "RGB" else (lambda color: color[0])
+        for drawing in self.drawings:
+            operation, args = drawing[0], drawing[1:]
+            if operation == "rectangle":
+                upleft, downright, color, thickness = args
+                draw.rectangle((upleft, downright), outline=ink(color), width=thickness)
+            elif operation == "circle":
+                (x, y), radius, color, thickness = args
+                draw.ellipse((x - radius, y - radius, x + radius, y + radius),
+                             outline=ink(color), width=thickness)
+            elif operation == "contours":
+                contours, color = args
+                for contour in contours:
+                    points = [tuple(point) for point in contour.reshape(-1, 2).tolist()]
+                    draw.line(points + points[:1], fill=ink(color))
+            elif operation == "text":
+                location, text, color = args
+                draw.text(location, text, fill=ink(color))
+            elif operation == "paste":
+                hotmap, upleft = args
+                subcanvas = hotmap.render()
+                if not isinstance(subcanvas, PIL.Image.Image):
+                    subcanvas = PIL.Image.fromarray(subcanvas)
+                canvas.paste(subcanvas.convert(canvas.mode), upleft)
+        del draw
+
+    def _draw_cv(self, canvas):
+        import cv2
+        import numpy
+        for drawing in self.drawings:
+            operation, args = drawing[0], drawing[1:]
+            if operation == "rectangle":
+                cv2.rectangle(canvas, *args)
+            elif operation == "circle":
+                cv2.circle(canvas, *args)
+            elif operation == "contours":
+                cv2.drawContours(canvas, args[0], -1, args[1])
+            elif operation == "text":
+                cv2.putText(canvas, args[1], args[0], cv2.FONT_HERSHEY_SIMPLEX, 0.5, args[2])
+            elif operation == "paste":
+                hotmap, (x, y) = args
+                subcanvas = numpy.asarray(hotmap.render())
+                height, width = subcanvas.shape[:2]
+                canvas[y:y+height, x:x+width] = subcanvas
@@ -403,7 +403,7 @@ class Region(object):
         while True:
             screen_capture = dc_backend.capture_screen(self)
 
-            found_pics = cv_backend.find(target, screen_capture)
+            found_pics = cv_backend.find(target, screen_capture, limit=1)
             if len(found_pics) > 0:
                 from .match import Match
                 match = found_pics[0]
@@ -244,6 +244,7 @@ class Image(Target):
         super(Image, self).__init__(match_settings)
         self._filename = image_filename
         self._pil_image = None
+        self._derived = {}
         self._width = 0
         self._height = 0
 
@@ -305,6 +306,52 @@ class Image(Target):
         return self._pil_image
     pil_image = property(fget=get_pil_image)
 
+    def get_numpy_image(self):
+        """
+        Getter for readonly attribute.
+
+        :returns: image data of the image as an RGB array
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        import numpy
+        return self.derive("numpy", numpy.array, self._pil_image)
+    numpy_image = property(fget=get_numpy_image)
+
+    def get_gray_image(self):
+        """
+        Getter for readonly attribute.
+
+        :returns: image data of the image as a grayscale array
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        import cv2
+        return self.derive("gray", cv2.cvtColor, self.numpy_image, cv2.COLOR_RGB2GRAY)
+    gray_image = property(fget=get_gray_image)
+
+    def derive(self, key, function, *args):
+        """
+        Get a representation derived from the image data computing it only once.
+
+        :param key: identifier of the representation including any parameters
+                    it depends on, e.g. ("binarized", "adaptive", ...)
+        :type key: str or tuple
+        :param function: function to compute the representation with if missing
+        :type function: callable
+        :param args: arguments for the function
+        :returns: derived representation (read-only if it is an array)
+
+        The derived representations are shared among all finders using the same
+        image (e.g. a screen capture) and are kept for the lifetime of the image
+        data. Arrays are made read-only so that they are copied before being
+        modified in place.
+        """
+        if key not in self._derived:
+            derived = function(*args)
+            if hasattr(derived, "flags"):
+                derived.flags.writeable = False
+            self._derived[key] = derived
+        return self._derived[key]
+
     def load(self, filename, use_cache=True, **kwargs):
         """
         Load image from a file.
@@ -316,6 +363,8 @@ class Image(Target):
         if not os.path.exists(filename):
             filename = FileResolver().search(filename)
 
+        # any derived images are only valid for the previous image data
+        self._derived = {}
         # TODO: check if mtime of the file changed -> cache dirty?
         if use_cache and filename in self._cache:
             self._pil_image = self._cache[filename]
@@ -364,6 +413,7 @@ class Text(Target):
         super(Text, self).__init__(match_settings)
         self.value = value
         self.text_file = None
+        self._masks = None
 
         try:
             filename = FileResolver().search(str(self) + ".txt")
@@ -400,29 +450,96 @@ class Text(Target):
         with open(filename, "w") as f:
             f.write(self.value)
 
-    def distance_to(self, str2):
+    def distance_to(self, str2, max_distance=None):
         """
-        Approximate Hungarian distance.
+        Levenshtein (edit) distance to another string.
 
         :param str str2: string to compare to
-        :returns: string distance value
-        :rtype: float
+        :param max_distance: maximal distance of interest if any
+        :type max_distance: int or None
+        :returns: string distance value or any larger value than the maximal
+                  distance if the strings are further apart than it
+        :rtype: int
+
+        The distance is computed with the bit-parallel algorithm of Myers
+        (in the formulation of Hyyroe) processing the text value as a bit
+        vector with one operation per character of the other string.
         """
-        str1 = self.value
-        import numpy
-        M = numpy.empty((len(str1) + 1, len(str2) + 1), numpy.int)
+        return self._bit_parallel_distance(self._pattern_masks(), str2, max_distance)
+
+    def distances_to(self, strings, max_distance=None):
+        """
+        Levenshtein (edit) distances to multiple strings.
+
+        :param strings: strings to compare to
+        :type strings: [str]
+        :param max_distance: maximal distance of interest if any
+        :type max_distance: int or None
+        :returns: string distance values in the order of the strings
+        :rtype: [int]
+
+        See :py:func:`Text.distance_to` for details.
+        """
+        masks = self._pattern_masks()
+        return [self._bit_parallel_distance(masks, str2, max_distance) for str2 in strings]
 
-        for a in range(0, len(str1)+1):
-            M[a,0] = a
-        for b in range(0, len(str2)+1):
-            M[0,b] = b
+    def _pattern_masks(self):
+        """
+        Bit masks of the character positions in the text value.
+
+        :returns: text length and a bit mask per character
+        :rtype: (int, {str: int})
+        """
+        if self._masks is not None and self._masks[0] == self.value:
+            return self._masks[1]
+        masks = {}
+        for i, char in enumerate(self.value):
+            masks[char] = masks.get(char, 0) | (1 << i)
+        self._masks = (self.value, (len(self.value), masks))
+        return self._masks[1]
 
-        for a in range(1, len(str1)+1):  #(size_t a = 1; a <= NA; ++a):
-            for b in range(1, len(str2)+1):  #(size_t b = 1; b <= NB; ++b)
-                z = M[a-1,b-1] + (0 if str1[a-1] == str2[b-1] else 1)
-                M[a,b] = min(min(M[a-1,b] + 1, M[a,b-1] + 1), z)
+    @staticmethod
+    def _bit_parallel_distance(pattern_masks, str2, max_distance=None):
+        """
+        Levenshtein distance of a pattern given by its bit masks to a string.
 
-        return M[len(str1),len(str2)]
+        :param pattern_masks: pattern length and bit mask per character
+        :type pattern_masks: (int, {str: int})
+        :param str str2: string to compare to
+        :param max_distance: maximal distance of interest if any
+        :type max_distance: int or None
+        :returns: string distance value or a larger one than the maximal
+        :rtype: int
+        """
+        length, masks = pattern_masks
+        if length == 0:
+            return len(str2)
+        if max_distance is not None and abs(length - len(str2)) > max_distance:
+            return max_distance + 1
+
+        full = (1 << length) - 1
+        last = 1 << (length - 1)
+        # vertical positive and negative differences of the last column
+        positive, negative = full, 0
+        distance = length
+        for j, char in enumerate(str2):
+            equal = masks.get(char, 0)
+            vertical = equal | negative
+            horizontal = (((equal & positive) + positive) ^ positive) | equal
+            hpositive = negative | (~(horizontal | positive) & full)
+            hnegative = positive & horizontal
+            if hpositive & last:
+                distance += 1
+            elif hnegative & last:
+                distance -= 1
+            # the final distance decreases by at most one per remaining character
+            if max_distance is not None and distance - (len(str2) - j - 1) > max_distance:
+                return max_distance + 1
+            hpositive = ((hpositive << 1) | 1) & full
+            hnegative = (hnegative << 1) & full
+            positive = hnegative | (~(vertical | hpositive) & full)
+            negative = hpositive & vertical
+        return distance
 
 
 class Pattern(Target):
@@ -18,6 +18,8 @@ import os
 import re
 import unittest
 import shutil
+import tempfile
+from unittest.mock import MagicMock, call, patch
 
 import common_test
 from guibot.config import GlobalConfig
@@ -273,6 +275,77 @@ class FinderTest(unittest.TestCase):
                 shutil.rmtree(self.logpath)
                 i += 1
 
+    @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1", "OpenCV disabled")
+    def test_contour_distances(self):
+        import cv2
+        import numpy
+        finder = ContourFinder()
+        finder.params["contour"]["minArea"].value = 100
+        needle = numpy.array(Image('n_ibs').pil_image)
+        haystack = numpy.array(Image('h_ibs_viewport').pil_image)
+        needle_contours = finder._extract_contours(finder._binarize_image(needle))
+        haystack_contours = finder._extract_contours(finder._binarize_image(haystack))
+
+        for method in [1, 2, 3]:
+            finder.params["contour"]["contoursMatch"].value = method
+            distances = finder._match_contours(haystack_contours, needle_contours)
+            self.assertEqual(distances.shape, (len(haystack_contours), len(needle_contours)))
+            # compare against a pairwise shape matching
+            for i, hcontour in enumerate(haystack_contours):
+                for j, ncontour in enumerate(needle_contours):
+                    if (cv2.contourArea(hcontour) < 100 or
+                            cv2.contourArea(ncontour) < 100):
+                        self.assertEqual(distances[i, j], 1.0)
+                        continue
+                    expected = cv2.matchShapes(hcontour, ncontour, method, 0)
+                    self.assertAlmostEqual(distances[i, j], expected, places=9)
+
+    @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1", "OpenCV disabled")
+    def test_contour_layout(self):
+        import PIL.Image
+        import PIL.ImageDraw
+
+        def draw_shapes(draw, x, y):
+            draw.ellipse((x + 10, y + 10, x + 60, y + 60), fill=(0, 0, 0))
+            draw.rectangle((x + 90, y + 15, x + 130, y + 55), fill=(0, 0, 0))
+            draw.polygon([(x + 40, y + 120), (x + 70, y + 80), (x + 100, y + 120)], fill=(0, 0, 0))
+
+        needle = PIL.Image.new("RGB", (140, 130), (255, 255, 255))
+        draw_shapes(PIL.ImageDraw.Draw(needle), 0, 0)
+        haystack = PIL.Image.new("RGB", (800, 600), (255, 255, 255))
+        draw = PIL.ImageDraw.Draw(haystack)
+        positions = [(30, 40), (500, 350)]
+        for position in positions:
+            draw_shapes(draw, *position)
+        # the same shapes scattered far from each other
+        draw.ellipse((600, 20, 650, 70), fill=(0, 0, 0))
+        draw.rectangle((100, 450, 140, 490), fill=(0, 0, 0))
+        draw.polygon([(300, 300), (330, 260), (360, 300)], fill=(0, 0, 0))
+
+        finder = ContourFinder()
+        finder.params["find"]["similarity"].value = 0.8
+        finder.params["contour"]["minArea"].value = 100
+        matches = finder.find(Image(pil_image=needle), Image(pil_image=haystack))
+        self.assertEqual(len(matches), 2)
+        for match, position in zip(sorted(matches, key=lambda m: m.x), positions):
+            self.assertEqual((match.x, match.y), position)
+            self.assertEqual((match.width, match.height), needle.size)
+
+        matches = finder.find(Image(pil_image=needle), Image(pil_image=haystack), limit=1)
+        self.assertEqual(len(matches), 1)
+
+        # the best assignments are returned regardless of their anchor order
+        assign_contours = finder._assign_contours
+        def worst_first(*args):
+            return sorted(assign_contours(*args), key=lambda g: g[1], reverse=True)
+        with patch.object(finder, "_assign_contours", side_effect=worst_first):
+            best_matches = finder.find(Image(pil_image=needle), Image(pil_image=haystack))
+            self.assertEqual(len(best_matches), 2)
+            self.assertGreaterEqual(best_matches[0].similarity, best_matches[1].similarity)
+            matches = finder.find(Image(pil_image=needle), Image(pil_image=haystack), limit=1)
+        self.assertEqual((matches[0].x, matches[0].y, matches[0].similarity),
+                         (best_matches[0].x, best_matches[0].y, best_matches[0].similarity))
+
     @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1", "OpenCV disabled")
     def test_template_same(self):
         finder = TemplateFinder()
@@ -381,6 +454,63 @@ class FinderTest(unittest.TestCase):
             self.assertRegex(hotmap, ".*-\d\.\d+.*")
             self.assertTrue(os.path.isfile(os.path.join(self.logpath, hotmap)))
 
+    @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1", "OpenCV disabled")
+    def test_template_limit(self):
+        finder = TemplateFinder()
+        all_matches = finder.find(Image('shape_red_box'), Image('all_shapes'))
+        self.assertGreater(len(all_matches), 1)
+        matches = finder.find(Image('shape_red_box'), Image('all_shapes'), limit=1)
+        self.assertEqual(len(matches), 1)
+        self.assertEqual((matches[0].x, matches[0].y), (all_matches[0].x, all_matches[0].y))
+        self.assertEqual(matches[0].similarity, all_matches[0].similarity)
+
+    @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1", "OpenCV disabled")
+    def test_template_spectral(self):
+        finder = TemplateFinder()
+        finder.configure_backend("ccoeff_normed")
+        finder.params["find"]["similarity"].value = 0.8
+
+        for nocolor in (False, True):
+            finder.params["template"]["nocolor"].value = nocolor
+            finder.params["template"]["engine"].value = 1
+            direct_matches = finder.find(Image('shape_blue_circle'), Image('all_shapes'))
+            finder.params["template"]["engine"].value = 2
+            spectral_matches = finder.find(Image('shape_blue_circle'), Image('all_shapes'))
+            # the haystack spectra are reused on the second search
+            spectral_rematches = finder.find(Image('shape_blue_circle'), Image('all_shapes'))
+
+            self.assertGreater(len(direct_matches), 0)
+            for matches in (spectral_matches, spectral_rematches):
+                self.assertEqual(len(matches), len(direct_matches))
+                for match, direct_match in zip(matches, direct_matches):
+                    self.assertEqual((match.x, match.y), (direct_match.x, direct_match.y))
+                    self.assertAlmostEqual(match.similarity, direct_match.similarity, delta=0.001)
+
+    def test_template_spectral_cost(self):
+        finder = TemplateFinder(synchronize=False)
+        haystack_shape = (1080, 1920, 3)
+        # small needles are matched directly and larger ones in the frequency
+        # domain, earlier if the haystack spectra are already available
+        for size, uncached, cached in [(32, False, False), (64, False, False),
+                                       (96, False, True), (128, True, True)]:
+            self.assertEqual(finder._prefer_spectral_match((size, size, 3), haystack_shape, False), uncached)
+            self.assertEqual(finder._prefer_spectral_match((size, size, 3), haystack_shape, True), cached)
+
+    @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1", "OpenCV disabled")
+    def test_template_spectra_release(self):
+        import gc
+        import PIL.Image
+        finder = TemplateFinder()
+        finder.configure_backend("ccoeff_normed")
+        finder.params["template"]["engine"].value = 2
+        haystack = Image(pil_image=PIL.Image.open(Image('all_shapes').filename).copy())
+        finder.find(Image('shape_blue_circle'), haystack)
+        self.assertIn(False, TemplateFinder._spectra)
+        # the spectra do not outlive their haystack
+        del haystack
+        gc.collect()
+        self.assertEqual(TemplateFinder._spectra, {})
+
     @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1", "OpenCV disabled")
     def test_feature_same(self):
         finder = FeatureFinder()
@@ -498,6 +628,143 @@ class FinderTest(unittest.TestCase):
         self.assertAlmostEqual(matches[0].width, 160, delta=10)
         self.assertAlmostEqual(matches[0].height, 235, delta=10)
 
+    @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1", "OpenCV disabled")
+    def test_feature_cached_haystack(self):
+        finder = FeatureFinder()
+        finder.params["find"]["similarity"].value = 0.4
+        haystack = Image('h_ibs_viewport')
+        matches = finder.find(Image('n_ibs'), haystack)
+        self.assertEqual(len(matches), 1)
+
+        self.assertIs(FeatureFinder._hfeatures["source"], haystack.pil_image)
+        hfeatures = dict(FeatureFinder._hfeatures)
+        self.assertEqual(len(hfeatures), 2)
+
+        cached_matches = finder.find(Image('n_ibs'), haystack)
+        # the same haystack features were reused rather than detected again
+        self.assertEqual(FeatureFinder._hfeatures, hfeatures)
+        for key in hfeatures:
+            self.assertIs(FeatureFinder._hfeatures[key], hfeatures[key])
+        self.assertEqual(len(cached_matches), 1)
+        self.assertEqual((cached_matches[0].x, cached_matches[0].y), (matches[0].x, matches[0].y))
+        self.assertEqual(cached_matches[0].similarity, matches[0].similarity)
+
+    @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1", "OpenCV disabled")
+    def test_feature_stored_needle(self):
+        finder = FeatureFinder()
+        finder.params["find"]["similarity"].value = 0.4
+        needle_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, needle_dir)
+        needle_file = os.path.join(needle_dir, 'n_ibs.png')
+        shutil.copy(Image('n_ibs').filename, needle_file)
+        Finder.to_match_file(finder, os.path.join(needle_dir, 'n_ibs.match'))
+        features_file = os.path.join(needle_dir, 'n_ibs.npz')
+
+        matches = finder.find(Image(needle_file), Image('h_ibs_viewport'))
+        self.assertEqual(len(matches), 1)
+        self.assertTrue(os.path.isfile(features_file))
+        features_mtime = os.path.getmtime(features_file)
+
+        # a new process would only have the features file available
+        FeatureFinder._nfeatures.clear()
+        stored_matches = finder.find(Image(needle_file), Image('h_ibs_viewport'))
+        self.assertEqual(len(stored_matches), 1)
+        self.assertEqual((stored_matches[0].x, stored_matches[0].y), (matches[0].x, matches[0].y))
+        self.assertAlmostEqual(stored_matches[0].similarity, matches[0].similarity)
+        self.assertEqual(os.path.getmtime(features_file), features_mtime)
+
+        # stale features file due to different detection parameters
+        FeatureFinder._nfeatures.clear()
+        os.utime(features_file, (0, 0))
+        finder.params["fdetect"]["MaxFeatures"].value = 1000
+        finder.find(Image(needle_file), Image('h_ibs_viewport'))
+        self.assertNotEqual(os.path.getmtime(features_file), 0)
+
+    @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1", "OpenCV disabled")
+    def test_feature_multiple(self):
+        import PIL.Image
+        finder = FeatureFinder()
+        finder.params["feature"]["multiInstance"].value = True
+        # the haystack features are shared among all instances
+        finder.params["find"]["similarity"].value = 0.2
+        needle = Image('n_ibs')
+        positions = [(20, 30), (needle.width + 60, 100), (2 * needle.width + 80, 10)]
+        canvas = PIL.Image.new("RGB", (3 * needle.width + 100, needle.height + 150), (255, 255, 255))
+        for position in positions:
+            canvas.paste(needle.pil_image, position)
+
+        matches = finder.find(needle, Image(pil_image=canvas))
+        self.assertEqual(len(matches), 3)
+        for match, position in zip(sorted(matches, key=lambda m: m.x), positions):
+            self.assertAlmostEqual(match.x, position[0], delta=5)
+            self.assertAlmostEqual(match.y, position[1], delta=5)
+            self.assertAlmostEqual(match.width, needle.width, delta=10)
+            self.assertAlmostEqual(match.height, needle.height, delta=10)
+
+        matches = finder.find(needle, Image(pil_image=canvas), limit=1)
+        self.assertEqual(len(matches), 1)
+
+        # a single instance is found just as without the multiple instance search
+        finder.params["find"]["similarity"].value = 0.4
+        matches = finder.find(Image('n_ibs'), Image('h_ibs_viewport'))
+        self.assertEqual(len(matches), 1)
+        self.assertAlmostEqual(matches[0].x, 68, delta=5)
+        self.assertAlmostEqual(matches[0].y, 18, delta=5)
+
+    @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1", "OpenCV disabled")
+    def test_feature_library(self):
+        finder = FeatureFinder()
+        finder.params["find"]["similarity"].value = 0.4
+        needles = [Image('n_ibs'), Image('coco_cat'), Image('shape_text')]
+        for needle in needles:
+            finder.add_to_library(needle)
+
+        results = finder.find_library(Image('h_ibs_viewport'))
+        self.assertEqual(set(results.keys()), set(needles))
+        self.assertEqual(len(results[needles[0]]), 1)
+        self.assertEqual(results[needles[1]], [])
+        self.assertEqual(results[needles[2]], [])
+
+        matches = finder.find(Image('n_ibs'), Image('h_ibs_viewport'))
+        self.assertEqual(len(matches), 1)
+        self.assertEqual((results[needles[0]][0].x, results[needles[0]][0].y), (matches[0].x, matches[0].y))
+        self.assertAlmostEqual(results[needles[0]][0].similarity, matches[0].similarity)
+
+        # the in-house matchers cannot be trained with all needles at once
+        for backend in ["in-house-raw", "in-house-region"]:
+            finder.params["fmatch"]["backend"] = backend
+            self.assertRaises(UnsupportedBackendError, finder.add_to_library, Image('shape_text'))
+            self.assertRaises(UnsupportedBackendError, finder.find_library, Image('h_ibs_viewport'))
+
+    @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1", "OpenCV disabled")
+    def test_feature_match_filters(self):
+        import cv2
+        import numpy
+        from guibot.imagelogger import Hotmap
+        finder = FeatureFinder()
+        finder.params["fmatch"]["ratioTest"].value = True
+        finder.params["fmatch"]["symmetryTest"].value = True
+        ngray = cv2.cvtColor(numpy.array(Image('n_ibs').pil_image), cv2.COLOR_RGB2GRAY)
+        hgray = cv2.cvtColor(numpy.array(Image('h_ibs_viewport').pil_image), cv2.COLOR_RGB2GRAY)
+        finder.imglog.hotmaps.extend([Hotmap(hgray) for _ in range(4)])
+        finder.imglog.similarities.append(0.0)
+        nkp, ndc, hkp, hdc = finder._detect_features(ngray, hgray, "ORB", "ORB")
+        mnkp, mhkp = finder._match_features(nkp, ndc, hkp, hdc, "BruteForce-Hamming")
+        self.assertGreater(len(mnkp), 0)
+
+        # straightforward ratio and symmetry tests for reference
+        threshold = finder.params["fmatch"]["ratioThreshold"].value
+        def ratio_test(matches):
+            return [m[0] for m in matches if len(m) == 1 or
+                    (m[0].distance + 0.0000001) / (m[1].distance + 0.0000001) < threshold]
+        nmatches = ratio_test(finder.matcher.knnMatch(ndc, hdc, 2))
+        hmatches = ratio_test(finder.matcher.knnMatch(hdc, ndc, 2))
+        matches = [nm for nm in nmatches if any(nm.queryIdx == hm.trainIdx and
+                                                nm.trainIdx == hm.queryIdx for hm in hmatches)]
+        matches = sorted(matches, key=lambda x: x.distance)
+        self.assertEqual([kp.pt for kp in mnkp], [nkp[m.queryIdx].pt for m in matches])
+        self.assertEqual([kp.pt for kp in mhkp], [hkp[m.trainIdx].pt for m in matches])
+
     @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1", "OpenCV disabled")
     def test_cascade_same(self):
         finder = CascadeFinder()
@@ -719,6 +986,398 @@ class FinderTest(unittest.TestCase):
         self.assertAlmostEqual(matches[0].width, 100, delta=5)
         self.assertAlmostEqual(matches[0].height, 10, delta=5)
 
+    @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1" or
+                     os.environ.get('DISABLE_OCR', "0") == "1",
+                     "Disabled OpenCV or OCR")
+    def test_text_parallel(self):
+        finder = TextFinder()
+        finder.configure_backend("contours", "tdetect")
+        finder.synchronize_backend("contours", "tdetect")
+        finder.params["find"]["similarity"].value = 0.0
+        for ocr in ["pytesseract", "tesserocr"]:
+            finder.configure_backend(ocr, "ocr")
+            finder.synchronize_backend(ocr, "ocr")
+            sequential_matches = finder.find(Text('Find the word here'), Image('sentence_font'))
+            # the parallel OCR is merged in the order of the text regions
+            finder.params["ocr"]["workers"].value = 2
+            matches = finder.find(Text('Find the word here'), Image('sentence_font'))
+            self.assertGreater(len(matches), 0)
+            self.assertEqual([(m.x, m.y, m.similarity) for m in matches],
+                             [(m.x, m.y, m.similarity) for m in sequential_matches])
+
+    def test_text_parallel_workers(self):
+        import numpy
+        from multiprocessing import resource_tracker
+        finder = TextFinder(synchronize=False)
+        finder.configure_backend("pytesseract", "ocr")
+        finder.params["ocr"]["workers"].value = 2
+        finder.params["ocr"]["cache_size"].value = 0
+        regions = [numpy.full((10, 20 + i), i, dtype=numpy.uint8) for i in range(5)]
+
+        # the regions reach the worker processes through shared memory
+        with patch.object(TextFinder, "_ocr_worker_init", staticmethod(_fake_ocr_worker_init)):
+            outputs = [output for _, output in finder._recognize_text_regions(regions)]
+            TextFinder._pool.shutdown()
+            TextFinder._pool, TextFinder._pool_config = None, None
+        self.assertEqual(outputs, ["%s %s" % (region.shape, i) for i, region in enumerate(regions)])
+
+        # workers attach to the shared memory without registering it as their own
+        from multiprocessing import shared_memory
+        buffer = shared_memory.SharedMemory(create=True, size=regions[1].nbytes)
+        try:
+            numpy.ndarray(regions[1].shape, dtype=numpy.uint8, buffer=buffer.buf)[:] = regions[1]
+            _fake_ocr_worker_init()
+            with patch.object(resource_tracker, "register") as register:
+                output = TextFinder._ocr_worker_run(buffer.name, 0, regions[1].shape, "|u1")
+                register.assert_not_called()
+            self.assertEqual(output, "%s 1" % (regions[1].shape,))
+        finally:
+            TextFinder._worker_ocr = None
+            buffer.close()
+            buffer.unlink()
+
+    def test_text_ocr_cache(self):
+        import numpy
+        finder = TextFinder(synchronize=False)
+        finder.configure_backend("pytesseract", "ocr")
+        TextFinder.ocr_cache_clear()
+        regions = [numpy.full((10, 20), i, dtype=numpy.uint8) for i in range(3)]
+
+        with patch.object(finder, "_recognize_text", side_effect=lambda img: str(img[0, 0])) as ocr:
+            outputs = [output for _, output in finder._recognize_text_regions(regions)]
+            self.assertEqual(outputs, ["0", "1", "2"])
+            self.assertEqual(TextFinder.ocr_cache_info(), (0, 3, 3))
+            # only unseen regions reach the OCR
+            outputs = [output for _, output in finder._recognize_text_regions(regions + [regions[0] + 5])]
+            self.assertEqual(outputs, ["0", "1", "2", "5"])
+            self.assertEqual(ocr.call_count, 4)
+            self.assertEqual(TextFinder.ocr_cache_info(), (3, 4, 4))
+
+            # different OCR parameters require new recognition
+            finder.params["ocr"]["psmode"].value = 7
+            list(finder._recognize_text_regions(regions[:1]))
+            self.assertEqual(ocr.call_count, 5)
+
+            # the cache is bounded to the least recently used outputs
+            finder.params["ocr"]["cache_size"].value = 2
+            list(finder._recognize_text_regions(regions))
+            self.assertEqual(TextFinder.ocr_cache_info()[2], 2)
+            finder.params["ocr"]["cache_size"].value = 0
+            list(finder._recognize_text_regions(regions))
+            self.assertEqual(ocr.call_count, 10)
+        TextFinder.ocr_cache_clear()
+
+    def test_text_east_decoding(self):
+        import numpy
+        finder = TextFinder(synchronize=False)
+        finder.configure_backend("east", "tdetect")
+        probability = numpy.zeros((1, 1, 80, 80), dtype=numpy.float32)
+        geometry = numpy.zeros((1, 5, 80, 80), dtype=numpy.float32)
+        # two adjacent cells predicting the same word box and a separate weaker one
+        probability[0, 0, 10, 20:22] = [0.9, 0.95]
+        probability[0, 0, 50, 40] = 0.85
+        probability[0, 0, 60, 60] = 0.5
+        geometry[0, :4, 10, 20] = [6, 20, 2, 40]
+        geometry[0, :4, 10, 21] = [6, 16, 2, 44]
+        geometry[0, :4, 50, 40] = [4, 8, 4, 8]
+
+        rects, confidences = finder._decode_east(probability, geometry, 2.0, 1.0)
+        # the cells are scanned row by row and the unlikely cell is pruned
+        self.assertEqual(rects, [[88, 38, 120, 8], [88, 38, 120, 8], [312, 200, 32, 8]])
+        numpy.testing.assert_allclose(confidences, [0.9, 0.95, 0.85])
+
+        rects = finder._suppress_nonmaxima(rects + [[100, 100, 10, 10]], confidences + [0.99])
+        self.assertEqual(rects, [[100, 100, 10, 10], [88, 38, 120, 8], [312, 200, 32, 8]])
+
+    def test_text_east_tiling(self):
+        import cv2
+        import numpy
+        finder = TextFinder(synchronize=False)
+        finder.configure_backend("east", "tdetect")
+        # the fixed network input dimensions are used unless adaptive
+        self.assertEqual(finder._east_tiles(1920, 1080), [(0, 0, 1920, 1080)])
+        self.assertEqual(finder._east_resolution(1920, 1080), (320, 320))
+        finder.params["tdetect"]["adaptive_res"].value = True
+        finder.params["tdetect"]["max_input_res"].value = 640
+        # small haystacks are processed at once at their own rounded up resolution
+        self.assertEqual(finder._east_tiles(300, 200), [(0, 0, 300, 200)])
+        self.assertEqual(finder._east_resolution(300, 200), (320, 224))
+        tiles = finder._east_tiles(1920, 1080)
+        self.assertEqual(len(tiles), 8)
+        self.assertEqual({tile[2:] for tile in tiles}, {(540, 580)})
+        self.assertEqual(max(x + w for x, _, w, _ in tiles), 1920)
+        self.assertEqual(max(y + h for _, y, _, h in tiles), 1080)
+
+        finder.params["tdetect"]["max_input_res"].value = 320
+        finder.params["tdetect"]["threads"].value = 1
+        haystack = Image('all_shapes')
+        tiles = finder._east_tiles(haystack.width, haystack.height)
+        inp_width, inp_height = finder._east_resolution(tiles[0][2], tiles[0][3])
+        probability = numpy.zeros((len(tiles), 1, inp_height // 4, inp_width // 4), dtype=numpy.float32)
+        geometry = numpy.zeros((len(tiles), 5, inp_height // 4, inp_width // 4), dtype=numpy.float32)
+        # the same text box detected by the last two tiles in their own coordinates
+        probability[-2:, 0, 2, 2] = 0.9
+        geometry[-2:, :4, 2, 2] = [2, 8, 2, 8]
+        finder.east_net = MagicMock()
+        finder.east_net.forward.return_value = (probability, geometry)
+        default_threads = cv2.getNumThreads()
+        regions = finder._detect_text_east(haystack)
+        # all tiles are processed in a single forward pass with restored threads
+        finder.east_net.forward.assert_called_once()
+        self.assertEqual(finder.east_net.setInput.call_args[0][0].shape, (len(tiles), 3, inp_height, inp_width))
+        self.assertEqual(cv2.getNumThreads(), default_threads)
+        width_ratio = tiles[0][2] / inp_width
+        self.assertEqual(len(regions), 2)
+        self.assertEqual([region[0] - tiles[-2 + i][0] for i, region in enumerate(regions)],
+                         [int(4 * width_ratio)] * 2)
+
+    @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1", "Disabled OpenCV")
+    def test_text_erstat_channels(self):
+        finder = TextFinder(synchronize=False)
+        finder.configure_backend("erstat", "tdetect")
+        finder.synchronize_backend("erstat", "tdetect")
+        haystack = Image('h_ibs_viewport')
+        regions = finder._detect_text_erstat(haystack)
+        self.assertEqual(regions, [[98, 200, 126, 34], [99, 105, 66, 17], [94, 126, 99, 18]])
+
+        # only the selected channels are processed
+        finder.params["tdetect"]["channels"].value = "Ll"
+        filters = list(finder.erfilters)
+        with patch.object(finder, "_detect_channel_erstat",
+                          wraps=finder._detect_channel_erstat) as detect_channel, \
+                patch.object(finder, "_create_erstat_filters",
+                             wraps=finder._create_erstat_filters) as create_filters:
+            regions = finder._detect_text_erstat(haystack)
+        self.assertEqual([c[0][1] for c in detect_channel.call_args_list], [3, 8])
+        # the filter pairs of the workers are reused instead of rebuilt per channel
+        self.assertEqual(len(filters), min(9, os.cpu_count() or 1))
+        self.assertEqual(create_filters.call_count, max(0, min(2, os.cpu_count() or 1) - len(filters)))
+        self.assertTrue(all(c[0][3:] in filters for c in detect_channel.call_args_list))
+        self.assertEqual(regions, [[99, 105, 66, 17], [94, 126, 99, 18], [98, 207, 116, 16]])
+        finder.params["tdetect"]["channels"].value = "LX"
+        self.assertRaises(UnsupportedBackendError, finder._detect_text_erstat, haystack)
+
+    def test_text_region_merge(self):
+        finder = TextFinder(synchronize=False)
+        rects = [[0, 0, 10, 10], [50, 0, 10, 10], [8, 8, 10, 10],
+                 # touching but not intersecting
+                 [60, 0, 10, 10],
+                 # intersecting only the merged bounding box of the first chain
+                 [16, 0, 4, 4],
+                 [100, 100, 5, 5]]
+        regions = finder._merge_regions(rects)
+        self.assertEqual(regions, [[0, 0, 20, 18], [50, 0, 10, 10], [60, 0, 10, 10], [100, 100, 5, 5]])
+        self.assertEqual(finder._merge_regions([]), [])
+
+    def test_text_character_grouping(self):
+        finder = TextFinder(synchronize=False)
+        finder.configure_backend("contours", "tdetect")
+        finder.params["tdetect"]["minChars"].value = 2
+        # two text lines, a distant character, and a line with too few characters
+        line1 = [[10 + 12 * i, 10 + i % 2, 10, 12] for i in range(5)]
+        line2 = [[12 + 12 * i, 40, 10, 12] for i in range(4)]
+        chars = line1[::2] + line2 + line1[1::2] + [[300, 10, 10, 12], [200, 200, 10, 12], [212, 200, 10, 12]]
+        regions = finder._group_characters(chars)
+        self.assertEqual(regions, [[10, 10, 58, 13], [12, 40, 46, 12]])
+
+        # vertical text is grouped along the other axis
+        finder.params["tdetect"]["orientation"].value = 1
+        regions = finder._group_characters([[y, x, h, w] for x, y, w, h in chars])
+        self.assertEqual(regions, [[10, 10, 13, 58], [40, 12, 12, 46]])
+
+    def test_text_adaptive_zoom(self):
+        import numpy
+        finder = TextFinder(synchronize=False)
+        finder.configure_backend("pytesseract", "ocr")
+        finder.params["ocr"]["binarize_text"].value = False
+        finder.params["ocr"]["border_size"].value = 0
+        finder.params["ocr"]["text_height"].value = 40
+        img = numpy.zeros((1000, 2000, 3), dtype=numpy.uint8)
+        # the fixed zoom is used by default without limiting the zoomed pixels
+        finder.params["ocr"]["zoom_factor"].value = 2.0
+        self.assertEqual(finder._prepare_text_region(img, [0, 0, 100, 10]).shape, (20, 200))
+        finder.params["ocr"]["zoom_factor"].value = 10.0
+        self.assertEqual(finder._zoom_factor(400, 300, 300), 10.0)
+        self.assertEqual(finder._prepare_text_region(img, [0, 0, 400, 300]).shape, (3000, 4000))
+        finder.params["ocr"]["zoom_factor"].value = 1.0
+        finder.params["ocr"]["adaptive_zoom"].value = True
+        # small text is enlarged and large text shrunk to the optimal letter height
+        self.assertEqual(finder._prepare_text_region(img, [0, 0, 100, 10]).shape, (40, 400))
+        self.assertEqual(finder._prepare_text_region(img, [0, 0, 400, 80]).shape, (40, 200))
+        # the zoomed region is limited to the maximal number of pixels
+        finder.params["ocr"]["max_pixels"].value = 10000
+        self.assertEqual(finder._prepare_text_region(img, [0, 0, 400, 10]).shape, (16, 632))
+        self.assertAlmostEqual(finder._zoom_factor(400, 10, 10), 2.5 ** 0.5)
+        # the letter height of a multi-line region is that of its tallest line
+        finder.params["ocr"]["max_pixels"].value = 0
+        lines = img.copy()
+        lines[40:60, 10:190] = 255
+        lines[120:140, 10:150] = 255
+        self.assertEqual(finder._prepare_text_region(lines, [0, 0, 200, 200]).shape, (400, 400))
+        self.assertEqual(finder._prepare_text_region(img, [0, 0, 200, 200]).shape, (40, 40))
+        # the fixed zoom is used for unknown text heights or if not adaptive
+        finder.params["ocr"]["max_pixels"].value = 0
+        finder.params["ocr"]["zoom_factor"].value = 2.0
+        self.assertEqual(finder._zoom_factor(2000, 1000), 2.0)
+        finder.params["ocr"]["adaptive_zoom"].value = False
+        self.assertEqual(finder._prepare_text_region(img, [0, 0, 100, 10]).shape, (20, 200))
+
+    def test_text_region_pruning(self):
+        import PIL.ImageDraw
+        import numpy
+        finder = TextFinder(synchronize=False)
+        finder.params["find"]["similarity"].value = 0.8
+        # a needle of 10 characters with up to 2 errors needs 8 to 12 characters
+        regions = [[0, 0, 100, 10], [0, 20, 15, 10], [0, 40, 60, 20], [0, 60, 140, 10], [0, 80, 500, 10]]
+        pruned = finder._prune_text_regions(regions, "some label")
+        # too narrow and too wide regions are skipped and the rest ordered by likelihood
+        self.assertEqual(pruned, [[0, 40, 60, 20], [0, 0, 100, 10], [0, 60, 140, 10]])
+        self.assertEqual(finder.skipped_regions, 2)
+        self.assertEqual(finder._prune_text_regions(regions, ""), regions)
+        self.assertEqual(finder.skipped_regions, 0)
+
+        # the text height is estimated per line of text ignoring any padding
+        haystack = PIL.Image.new("RGB", (600, 200), (255, 255, 255))
+        draw = PIL.ImageDraw.Draw(haystack)
+        draw.rectangle((10, 30, 109, 39), fill=(0, 0, 0))
+        for top in (110, 125, 140):
+            draw.rectangle((200, top, 249, top + 9), fill=(0, 0, 0))
+        img_haystack = numpy.array(haystack)
+        padded, multiline = [0, 0, 120, 70], [190, 100, 70, 60]
+        self.assertEqual(finder._text_line_heights(img_haystack, padded), [10])
+        self.assertEqual(finder._text_line_heights(img_haystack, multiline), [10, 10, 10])
+        self.assertEqual(finder._text_line_heights(img_haystack, [300, 0, 50, 50]), [])
+        # a text block of several short lines could still hold the needle
+        self.assertEqual(finder._prune_text_regions([padded, multiline], "some label"), [padded])
+        self.assertEqual(finder.skipped_regions, 1)
+        self.assertEqual(finder._prune_text_regions([padded, multiline], "some label", img_haystack),
+                         [padded, multiline])
+        self.assertEqual(finder.skipped_regions, 0)
+        # the padding of a line neither hides a needle that is too long nor too short for it
+        self.assertEqual(finder._prune_text_regions([padded, multiline], "some longer label"), [])
+        self.assertEqual(finder._prune_text_regions([padded, multiline], "some longer label", img_haystack),
+                         [padded, multiline])
+        self.assertEqual(finder._prune_text_regions([padded], "abcd"), [padded])
+        self.assertEqual(finder._prune_text_regions([padded], "abcd", img_haystack), [])
+        self.assertEqual(finder.skipped_regions, 1)
+
+        finder.configure_backend("contours", "tdetect")
+        finder.configure_backend("pytesseract", "ocr")
+        finder.params["ocr"]["cache_size"].value = 0
+        blank = Image(pil_image=PIL.Image.new("RGB", (600, 100), (255, 255, 255)))
+        # pruning is disabled by default
+        with patch.object(finder, "_detect_text_contours", return_value=regions), \
+                patch.object(finder, "_recognize_text", return_value="some label") as recognize:
+            finder.find(Text('some label'), blank)
+        self.assertEqual(recognize.call_count, 5)
+        self.assertEqual(finder.skipped_regions, 0)
+        finder.params["text"]["prune_regions"].value = True
+        with patch.object(finder, "_detect_text_contours", return_value=regions), \
+                patch.object(finder, "_recognize_text", return_value="some label") as recognize:
+            matches = finder.find(Text('some label'), blank)
+        self.assertEqual(recognize.call_count, 3)
+        self.assertEqual(len(matches), 3)
+        self.assertEqual(finder.skipped_regions, 2)
+
+    def test_text_rendered(self):
+        import PIL.ImageDraw
+        import PIL.ImageFont
+        haystack = PIL.Image.new("RGB", (300, 120), (230, 230, 230))
+        draw = PIL.ImageDraw.Draw(haystack)
+        draw.text((20, 15), "Cancel", font=PIL.ImageFont.load_default(14), fill=(0, 0, 0))
+        draw.text((120, 60), "Apply changes", font=PIL.ImageFont.load_default(13), fill=(20, 20, 20))
+        # bright text over dark background
+        draw.rectangle((0, 90, 300, 120), fill=(40, 40, 90))
+        draw.text((180, 95), "Cancel", font=PIL.ImageFont.load_default(14), fill=(255, 255, 255))
+        haystack = Image(pil_image=haystack)
+
+        finder = TextFinder(synchronize=False)
+        finder.configure_backend("pytesseract", "ocr")
+        finder.params["find"]["similarity"].value = 0.9
+        finder.params["text"]["render_fonts"].value = "default"
+        finder.params["text"]["render_sizes"].value = "12,13,14"
+        with patch.object(finder, "_recognize_text") as recognize:
+            matches = finder.find(Text("Cancel"), haystack)
+            self.assertEqual(sorted((m.x, m.y) for m in matches), [(20, 18), (180, 98)])
+            matches = finder.find(Text("Apply changes"), haystack, limit=1)
+            self.assertEqual([(m.x, m.y) for m in matches], [(120, 64)])
+            recognize.assert_not_called()
+
+        # matches can be verified with OCR which is also the fallback
+        finder.params["text"]["render_verify"].value = True
+        finder.params["ocr"]["cache_size"].value = 0
+        with patch.object(finder, "_recognize_text", side_effect=["Cancel", "Cance1"]) as recognize:
+            matches = finder.find(Text("Cancel"), haystack)
+            self.assertEqual(len(matches), 1)
+            self.assertEqual(recognize.call_count, 2)
+        finder.configure_backend("contours", "tdetect")
+        def detect_text(haystack):
+            finder.imglog.hotmaps += [haystack.pil_image, haystack.pil_image]
+            return []
+        with patch.object(finder, "_detect_text_contours", side_effect=detect_text) as detect:
+            self.assertEqual(finder.find(Text("Missing"), haystack), [])
+            detect.assert_called_once_with(haystack)
+
+    def test_text_render_cache(self):
+        import PIL.ImageFont
+        finder = TextFinder(synchronize=False)
+        finder.params["text"]["render_cache_size"].value = 2
+        TextFinder._rendered_texts.clear()
+        first = finder._render_text("Cancel", "default", 12)
+        finder._render_text("Apply", "default", 12)
+        # the least recently used rendering is dropped beyond the cache size
+        self.assertIs(finder._render_text("Cancel", "default", 12), first)
+        finder._render_text("Close", "default", 12)
+        self.assertEqual(list(TextFinder._rendered_texts), [("Cancel", "default", 12), ("Close", "default", 12)])
+        finder.params["text"]["render_cache_size"].value = 0
+        finder._render_text("Cancel", "default", 13)
+        self.assertEqual(TextFinder._rendered_texts, {})
+
+        # older Pillow versions only provide a fixed size default font
+        load_default = PIL.ImageFont.load_default
+        def fixed_default(*args):
+            if len(args) > 0:
+                raise TypeError("load_default() takes 0 positional arguments but 1 was given")
+            return load_default()
+        with patch.object(PIL.ImageFont, "load_default", side_effect=fixed_default) as default_font:
+            self.assertIsNotNone(finder._render_text("Cancel", "default", 20))
+        self.assertEqual(default_font.call_args_list, [call(20), call()])
+
+    def test_text_word_index(self):
+        finder = TextFinder(synchronize=False)
+        finder.configure_backend("pytesseract", "ocr")
+        finder.params["text"]["word_index"].value = True
+        finder.params["find"]["similarity"].value = 0.8
+        finder.ocr = MagicMock()
+        finder.ocr_config = ""
+        finder.ocr.image_to_data.return_value = {
+            "text": ["", "Name:", "Jane", "Doe", "Address:", "Main", "Str.", "1", "Nane:"],
+            "conf": ["-1", 90, 91, 92, 93, 94, 95, 96, 97],
+            "block_num": [1, 1, 1, 1, 1, 1, 1, 1, 2],
+            "par_num": [1, 1, 1, 1, 1, 1, 1, 1, 1],
+            "line_num": [1, 1, 1, 1, 2, 2, 2, 2, 1],
+            "left": [0, 10, 60, 100, 10, 90, 130, 170, 10],
+            "top": [0, 10, 10, 10, 30, 30, 30, 30, 60],
+            "width": [400, 40, 30, 30, 70, 30, 30, 10, 40],
+            "height": [100, 12, 12, 12, 12, 12, 12, 12, 12],
+        }
+        haystack = Image('all_shapes')
+
+        matches = finder.find(Text('Main Str. 1'), haystack)
+        self.assertEqual(len(matches), 1)
+        self.assertEqual((matches[0].x, matches[0].y, matches[0].width, matches[0].height), (90, 30, 90, 12))
+        self.assertEqual(matches[0].similarity, 1.0)
+
+        matches = finder.find(Text('Name:'), haystack)
+        self.assertEqual([(m.x, m.y, m.similarity) for m in matches], [(10, 10, 1.0), (10, 60, 0.8)])
+        matches = finder.find(Text('Name:'), haystack, limit=1)
+        self.assertEqual(len(matches), 1)
+        self.assertEqual(len(finder.find(Text('Phone:'), haystack)), 0)
+
+        # all needles are looked up in the same recognized frame, also for new captures
+        finder.find(Text('Jane Doe'), Image(pil_image=haystack.pil_image.copy()))
+        self.assertEqual(finder.ocr.image_to_data.call_count, 1)
+
     @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1" or
                      os.environ.get('DISABLE_OCR', "0") == "1",
                      "Disabled OpenCV or OCR")
@@ -794,6 +1453,103 @@ class FinderTest(unittest.TestCase):
             shutil.rmtree(self.logpath)
             i += 1
 
+    @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1", "OpenCV disabled")
+    def test_tempfeat_feature_poor(self):
+        finder = TemplateFeatureFinder()
+        finder.params["find"]["similarity"].value = 0.7
+        template_matches = TemplateFinder().find(Image('shape_red_box'), Image('all_shapes'))
+
+        with patch.object(finder, "_project_features") as project_features:
+            matches = finder.find(Image('shape_red_box'), Image('all_shapes'))
+            # the feature stage is skipped for feature poor needles
+            project_features.assert_not_called()
+        self.assertEqual(len(matches), len(template_matches))
+        for match, template_match in zip(matches, template_matches):
+            self.assertEqual((match.x, match.y), (template_match.x, template_match.y))
+            self.assertEqual(match.similarity, template_match.similarity)
+
+        # the analysis is kept with the needle also for needles without a file
+        import PIL.Image
+        needle = Image(pil_image=Image('shape_red_box').pil_image.copy())
+        finder.find(needle, Image('all_shapes'))
+        with patch.object(finder, "_detect_needle_features") as detect_needle_features:
+            self.assertEqual(len(finder.find(needle, Image('all_shapes'))), len(template_matches))
+            detect_needle_features.assert_not_called()
+
+    @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1", "OpenCV disabled")
+    def test_tempfeat_parallel(self):
+        import PIL.Image
+        finder = TemplateFeatureFinder()
+        finder.params["find"]["similarity"].value = 0.7
+        needle = Image('n_ibs')
+        positions = [(20, 30), (needle.width + 60, 100), (2 * needle.width + 80, 10)]
+        canvas = PIL.Image.new("RGB", (3 * needle.width + 100, needle.height + 150), (255, 255, 255))
+        for position in positions:
+            canvas.paste(needle.pil_image, position)
+        haystack = Image(pil_image=canvas)
+
+        # the concurrent verification is merged in the sequential order
+        with patch("os.cpu_count", return_value=1):
+            sequential_matches = finder.find(needle, haystack)
+        matches = finder.find(needle, haystack)
+        self.assertEqual(len(matches), 3)
+        self.assertEqual([(m.x, m.y, m.similarity) for m in matches],
+                         [(m.x, m.y, m.similarity) for m in sequential_matches])
+        for match, position in zip(sorted(matches, key=lambda m: m.x), positions):
+            self.assertEqual((match.x, match.y), position)
+
+        matches = finder.find(needle, haystack, limit=1)
+        self.assertEqual(len(matches), 1)
+        self.assertIn((matches[0].x, matches[0].y), positions)
+
+        # no verification is left running after an early stop
+        import time
+        import threading
+        running, started, lock = [0], [0], threading.Lock()
+        verify_candidate = finder._verify_candidate
+        def slow_verification(*args):
+            with lock:
+                running[0] += 1
+                started[0] += 1
+                # all but the first candidate are still verified after the early stop
+                delay = 0.0 if started[0] == 1 else 0.3
+            time.sleep(delay)
+            try:
+                return verify_candidate(*args)
+            finally:
+                with lock:
+                    running[0] -= 1
+        with patch("os.cpu_count", return_value=3), \
+                patch.object(finder, "_verify_candidate", side_effect=slow_verification):
+            matches = finder.find(needle, haystack, limit=1)
+            self.assertEqual(running[0], 0)
+        self.assertEqual(len(matches), 1)
+
+    @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1", "OpenCV disabled")
+    def test_feature_haystack_frame(self):
+        finder = FeatureFinder()
+        finder.synchronize_backend(category="fdetect")
+        finder.synchronize_backend(category="fextract")
+        other_finder = FeatureFinder()
+        other_finder.synchronize_backend(category="fdetect")
+        other_finder.synchronize_backend(category="fextract")
+        haystack, next_haystack = Image('h_ibs_viewport'), Image('all_shapes')
+        FeatureFinder._hfeatures.clear()
+        next_features = []
+        detect = finder.detector.detect
+        def replace_frame(hgray):
+            # another finder moves on to the next frame during the detection
+            next_features.extend(other_finder._detect_haystack_features(next_haystack.gray_image,
+                                                                        (next_haystack.pil_image, None)))
+            return detect(hgray)
+        with patch.object(finder, "detector") as detector:
+            detector.detect.side_effect = replace_frame
+            hkeypoints, _ = finder._detect_haystack_features(haystack.gray_image, (haystack.pil_image, None))
+        # the features of the previous frame are not stored for the next one
+        self.assertNotEqual(len(hkeypoints), len(next_features[0]))
+        self.assertIs(FeatureFinder._hfeatures["source"], next_haystack.pil_image)
+        self.assertEqual(FeatureFinder._hfeatures[(None,) + finder._features_key()][0], next_features[0])
+
     @unittest.skipIf(os.environ.get('DISABLE_OPENCV', "0") == "1", "OpenCV disabled")
     def test_tempfeat_nomatch(self):
         finder = TemplateFeatureFinder()
@@ -1011,5 +1767,12 @@ class CVParameterTest(unittest.TestCase):
         parsed = CVParameter.from_string("<value='123456789.' min='None' max='None' delta='1030.25' tolerance='10.2' fixed='False' enumerated='False'>")
         self.assertEqual(parsed, expected)
 
+def _fake_ocr_worker_init(*args):
+    """Set up an OCR in a worker process reporting the region it gets."""
+    ocr = MagicMock()
+    ocr.image_to_string.side_effect = lambda img, lang, config: "%s %s" % (img.shape, img[0, 0])
+    TextFinder._worker_ocr = ("pytesseract", ocr, "eng", "")
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -16,10 +16,11 @@
 
 import os
 import unittest
+import PIL.Image
 from PIL.Image import Image
 from unittest.mock import MagicMock, patch
 
-from guibot.imagelogger import ImageLogger
+from guibot.imagelogger import ImageLogger, Hotmap
 from guibot.config import GlobalConfig, TemporaryConfig
 
 
@@ -105,5 +106,22 @@ class ImageLoggerTest(unittest.TestCase):
             self.mock_mkdir.assert_called_once_with(ImageLogger.logging_destination)
             image_mock.save.assert_called_once_with(path, compress_level=cfg.image_quality)
 
+    def test_hotmap_lazy_rendering(self):
+        """Check that hotmaps are only drawn when actually dumped."""
+        source = MagicMock(return_value=PIL.Image.new("RGB", (20, 20)))
+        hotmap = Hotmap(source)
+        hotmap.rectangle((0, 0), (10, 10), (255, 0, 0), 2)
+        hotmap.circle((5, 5), 3, (0, 255, 0))
+        self.assertEqual(len(hotmap.drawings), 2)
+        with TemporaryConfig() as cfg:
+            cfg.image_logging_level = 35
+            ImageLogger().dump_hotmap("some_name", hotmap)
+            source.assert_not_called()
+
+        canvas = hotmap.render()
+        source.assert_called_once_with()
+        self.assertEqual(canvas.getpixel((0, 0)), (255, 0, 0))
+        self.assertEqual(canvas.getpixel((15, 15)), (0, 0, 0))
+
 if __name__ == '__main__':
     unittest.main()
@@ -148,6 +148,46 @@ class ImageTest(unittest.TestCase):
         third_image = Image(self.file_all_shapes)
         self.assertIsNot(image.pil_image, third_image.pil_image)
 
+    def test_derived_images(self):
+        image = Image(self.file_all_shapes)
+
+        numpy_image = image.numpy_image
+        self.assertEqual(numpy_image.shape, (300, 400, 3))
+        self.assertFalse(numpy_image.flags.writeable)
+        self.assertIs(image.numpy_image, numpy_image)
+        gray_image = image.gray_image
+        self.assertEqual(gray_image.shape, (300, 400))
+        self.assertIs(image.gray_image, gray_image)
+
+        compute = Mock(return_value="derived")
+        self.assertEqual(image.derive(("custom", 1), compute, 2), "derived")
+        self.assertEqual(image.derive(("custom", 1), compute, 2), "derived")
+        compute.assert_called_once_with(2)
+
+        # reloading the image data drops all derived images
+        image.load(self.file_all_shapes)
+        self.assertIsNot(image.numpy_image, numpy_image)
+
+
+class TextTest(unittest.TestCase):
+
+    def test_distance(self):
+        text = Text('kitten')
+        self.assertEqual(text.distance_to('kitten'), 0)
+        self.assertEqual(text.distance_to('sitting'), 3)
+        self.assertEqual(text.distance_to(''), 6)
+        self.assertEqual(Text('').distance_to('sitting'), 7)
+        self.assertEqual(text.distances_to(['sitting', 'mitten', 'kitchen']), [3, 1, 2])
+
+        # distances beyond the maximal one are only known to be larger
+        self.assertEqual(text.distance_to('sitting', max_distance=3), 3)
+        self.assertGreater(text.distance_to('sitting', max_distance=2), 2)
+        self.assertGreater(text.distance_to('a much longer string', max_distance=5), 5)
+
+        # changes of the text value are respected
+        text.value = 'sitting'
+        self.assertEqual(text.distance_to('sitting'), 0)
+
 
 class ChainTest(unittest.TestCase):
     """Tests for the chain target (series of steps)."""